@@ -1,11 +1,19 @@
-import streamlit as st
-from google import genai
-from fpdf import FPDF
-import json
 import os
-import random
-import re
-from tenacity import retry, stop_after_attempt, wait_exponential
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from engine import PUZZLE_CATALOG, shared_client, sanitize_filename, pick_puzzle_keys, generate_book, generate_book_per_page, stream_book
+from pdf_render import SPOOL_MEMORY_BYTES, fonts_available, is_large_book, render_book_chunked, render_book_incremental
+from images import ImageSpill
+from image_gen import DEFAULT_IMAGE_MODEL, GeminiImageBackend, GeneratedImageStore, generate_images
+from fake_gemini import FakeImageBackend
+from llm_cache import ResponseCache
+from validators import validate_page
+from metrics import Metrics, bind_context, collecting, configure_log
+from scheduler import DEFAULT_BURST, Scheduler, queued
 
 # ==========================================
 # 1. NASTAVENÍ A ZABEZPEČENÍ
@@ -17,124 +25,198 @@ if heslo != st.secrets["APP_PASSWORD"]:
     st.warning("🔒 Zadej správné heslo v levém panelu.")
     st.stop()
 
-client = genai.Client(api_key=st.secrets["GOOGLE_API_KEY"])
+# Klient se vytvoří jednou na proces a sdílí ho všechny relace i reruny
+@st.cache_resource
+def get_client():
+    return shared_client(st.secrets["GOOGLE_API_KEY"])
+
+client = get_client()
+
+# Cache odpovědí je společná pro všechny relace v procesu
+@st.cache_resource
+def get_llm_cache():
+    return ResponseCache()
+
+llm_cache = get_llm_cache()
+
+# Všechny relace sdílí jeden API klíč – dotazy jdou přes společnou fér frontu s limitem
+@st.cache_resource
+def get_scheduler():
+    return Scheduler(rate_per_sec=float(st.secrets.get("GEMINI_RATE_PER_SEC", 1.0)),
+                     burst=float(st.secrets.get("GEMINI_BURST", DEFAULT_BURST)))
+
+scheduler = get_scheduler()
+
+# Měření jako JSON řádky – bez handleru by je logger na úrovni WARNING zahodil.
+# Jednou na proces: do UNIKOVKY_METRICS_LOG, jinak na stderr
+@st.cache_resource
+def get_metrics_log():
+    return configure_log(os.environ.get("UNIKOVKY_METRICS_LOG"))
+
+get_metrics_log()
+
+# Nahrané obrázky se odkládají na disk, v session state zůstane jen odkaz na soubor
+@st.cache_resource
+def get_image_spill():
+    return ImageSpill()
+
+image_spill = get_image_spill()
+
+# Obrázkový model a cache vygenerovaných obrázků (podle promptu) – IMAGE_BACKEND = "fake" pro offline zkoušení
+@st.cache_resource
+def get_image_backend():
+    if st.secrets.get("IMAGE_BACKEND") == "fake": return FakeImageBackend()
+    return GeminiImageBackend(client, st.secrets.get("IMAGE_MODEL", DEFAULT_IMAGE_MODEL))
+
+@st.cache_resource
+def get_image_store():
+    return GeneratedImageStore()
+
+with st.sidebar.expander("🗄️ Cache odpovědí AI", expanded=False):
+    obejit_cache = st.checkbox("Obejít cache (vždy se ptát Gemini)", value=False)
+    stats = llm_cache.stats()
+    st.caption(f"Zásahy: {stats['hits']} · Minutí: {stats['misses']} · Záznamů: {stats['entries']} · {stats['bytes'] / 1024:.0f} kB")
+    if st.button("Vyprázdnit cache"):
+        llm_cache.clear()
 
 # Inicializace session state
 if 'book_data' not in st.session_state: st.session_state.book_data = []
 if 'book_theme' not in st.session_state: st.session_state.book_theme = ""
 if 'generated' not in st.session_state: st.session_state.generated = False
+if 'stream_job' not in st.session_state: st.session_state.stream_job = None
+if 'stream_error' not in st.session_state: st.session_state.stream_error = None
+if 'metrics' not in st.session_state: st.session_state.metrics = Metrics()
+if 'session_id' not in st.session_state: st.session_state.session_id = uuid.uuid4().hex
 
-# ==========================================
-# POMOCNÉ FUNKCE
-# ==========================================
-def sanitize_filename(text):
-    return re.sub(r'[^a-zA-Z0-9]', '_', text)[:50]
+def queue_status():
+    pozice = scheduler.position(st.session_state.session_id)
+    if pozice is None: return "🧠 Gemini přemýšlí..."
+    text = f"⏳ Ve frontě na Gemini: {pozice['position']}. na řadě z {pozice['sessions']} (tvých dotazů čeká: {pozice['waiting']})"
+    if pozice["cooldown"]: text += f" · API hlásí přetížení, pauza {pozice['cooldown']:.0f} s"
+    return text
 
-def extract_json_array(text):
-    match = re.search(r'\[.*\]', text, re.DOTALL)
-    if match: return json.loads(match.group(0))
-    raise ValueError("JSON pole nenalezeno.")
+def run_polling(show, fn, *args, **kwargs):
+    # Práce běží ve vlákně, aby skript mezitím mohl ukazovat průběh – show() se volá opakovaně
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(bind_context(fn), *args, **kwargs)
+        while not future.done():
+            show()
+            time.sleep(0.5)
+    return future.result()
 
-def extract_json_object(text):
-    match = re.search(r'\{.*\}', text, re.DOTALL)
-    if match: return json.loads(match.group(0))
-    raise ValueError("JSON objekt nenalezen.")
+def run_with_queue(fn, *args, **kwargs):
+    fronta = st.empty()
+    try:
+        return run_polling(lambda: fronta.info(queue_status()), fn, *args, **kwargs)
+    finally:
+        fronta.empty()
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
-def call_gemini_with_retry(prompt, model_name, expect_array=True):
-    res = client.models.generate_content(model=model_name, contents=prompt)
-    if expect_array: return extract_json_array(res.text)
-    else: return extract_json_object(res.text)
+def start_stream(tema, vybrane_klicky, cache, local):
+    # Vlákno jen plní sdílený slovník, na Streamlit nesahá – stránky si přebírá stream_watch()
+    job = {"items": [], "done": False, "error": None}
 
-# ==========================================
-# 2. KATALOG ŠIFER
-# ==========================================
-MASTER_STYLE = """
-A cheerful children's book illustration in a clean vector art style.
-Must have thick prominent outlines, flat vibrant colors, and a friendly, cute design.
-Clean solid white background. NO shadows, NO gradients, NO realism.
-"""
-
-PUZZLE_CATALOG = {
-    "matching": {
-        "name": "Přiřazování v tabulce (Grid Matching) – bez slov",
-        "instr": (
-            "CÍL: Výsledná šifra musí být řešitelná ČISTĚ Z OBRÁZKU (bez slov). "
-            "V obrázku NESMÍ být žádná písmena ani slova. ČÍSLICE JSOU POVOLENÉ jen v hlavičce (1, 2, 3)."
-            "\n\n"
-            "LAYOUT (PŘESNĚ): Vytvoř tabulku se 4 řádky + 1 hlavičkový řádek. "
-            "V hlavičce jsou POUZE tři buňky s čísly 1, 2, 3. "
-            "Pod hlavičkou jsou 4 řádky. Každý řádek má vlevo 1 velkou buňku s HLAVNÍ POSTAVOU TÉMATU "
-            "a vpravo přesně 3 buňky možností (sloupce 1/2/3). "
-            "\n\n"
-            "NÁPOVĚDA (BADGE): V levé buňce u postavy musí být malý piktogram (badge), který určuje správnou volbu. "
-            "Badge musí být tématický (např. pro Piráty to bude 'kotva', 'mince', ne 'hvězda' z ukázky)."
-            "\n\n"
-            "ADAPTACE TÉMATU (CRITICAL): Ukázka níže používá astronauty. "
-            "Pokud je tvé téma 'Piráti', v promptu nahraď 'astronaut' za 'pirate', 'helmet' za 'pirate hat'. "
-            "Pokud je téma 'Zvířata', použij 'animals'. NEKOPÍRUJ ASTRONAUTY!"
-            "\n\n"
-            "KÓD: Číslo 1–3, délka 4. Čti shora dolů podle správného sloupce."
-            "\n\n"
-            "PROMPT: Anglický prompt musí explicitně popsat mřížku. Místo slova 'astronaut' použij postavy z aktuálního příběhu."
-        ),
-        "ukazka": """
-        {
-          "nadpis": "Kód k únikovému modulu",
-          "zadani": "Najdi podle symbolu správný předmět pro každou postavu a získej kód.",
-          "kod": "2312",
-          "prompt": "Cheerful clean vector illustration, thick outlines, flat vibrant colors, solid white background. A strict table grid: ONE left column for characters + THREE option columns. Header row: ONLY digits 1, 2, 3 centered above options. Below header: exactly 4 rows. Each row: Left cell contains a [THEME_CHARACTER_HEAD] icon AND a small clue badge icon inside (e.g., specific tool or symbol). To the right: 3 item cells. ABSOLUTELY NO WORDS. Digits 1-3 allowed only in header. Each row's clue badge matches exactly one item."
-        }
-        """
-    },
-    "hidden_objects": {
-        "name": "Skryté předměty (Počítání)", 
-        "instr": "IGNORUJ POKYN PRO SLOVNÍ KÓD! Zde MUSÍ být kód POUZE ČÍSLO. Počet číslic v kódu se musí rovnat počtu otázek! Do textu 'zadani' VYPIŠ OČÍSLOVANÝ SEZNAM otázek.",
-        "ukazka": """
-        {
-          "nadpis": "Ztracené hračky",
-          "zadani": "Spočítejte předměty na obrázku a získejte tajný kód:\n1. Kolik je tam medvídků?\n2. Kolik vidíš autíček?\n3. Kolik je tam balónů?",
-          "kod": "524",
-          "prompt": "A messy playroom floor with scattered toys. Specifically visible: 5 teddy bears, 2 toy cars, and 4 balloons among other items."
-        }
-        """
-    },
-    "logic_elimination": {"name": "Logická vyřazovačka", "instr": "4 dveře a 3 logické nápovědy. Zbydou jen jedny správné."},
-    "fill_level": {"name": "Lektvary (Řazení)", "instr": "4 nádoby, každá jinak plná. Kód vznikne seřazením od nejplnější."},
-    "shadows": {"name": "Stínové pexeso", "instr": "Spojování předmětů s jejich stíny."},
-    "pigpen_cipher": {"name": "Šifra symbolů (Ikony)", "instr": "Použij jednoduché ikony (slunce, mrak...) a vypiš legendu."},
-    "caesar": {"name": "Posunutá abeceda (Caesar)", "instr": "Text zašifrovaný posunem v abecedě."},
-    "morse": {"name": "Zvuková Morseovka", "instr": "Zvířata dělají krátké a dlouhé zvuky."},
-    "dirty_keypad": {"name": "Forenzní stopy", "instr": "4 tlačítka, každé jinak špinavé. Seřaď od nejšpinavějšího."},
-    "diagonal_acrostic": {"name": "Diagonální čtení", "instr": "Seznam 4 slov. Čti diagonálně (1. písmeno 1. slova...)."},
-    "mirror_writing": {"name": "Zrcadlové písmo", "instr": "Tajné slovo napsané zrcadlově pozpátku."},
-    "matrix_indexing": {"name": "Dvojitá mřížka", "instr": "Mřížka s písmeny a mřížka s čísly."},
-    "grid_navigation": {"name": "Bludiště s šipkami", "instr": "Mřížka s písmeny a šipky navigující ke kódu."},
-    "camouflaged_numbers": {"name": "Maskovaná čísla", "instr": "Čísla ukrytá v geometrických tvarech."},
-    "feature_filtering": {"name": "Filtrování mincí", "instr": "Čtení písmen jen pod mincemi určité barvy."},
-    "size_sorting": {"name": "Porovnávání velikostí", "instr": "Seřazení předmětů podle velikosti."},
-    "word_structure": {"name": "Lingvistická detektivka", "instr": "Hledání slova podle gramatických pravidel."},
-    "composite_symbols": {"name": "Skládané symboly", "instr": "Matematika se symboly."},
-    "coordinate_drawing": {"name": "Kreslení souřadnic", "instr": "Vybarvi A1, B2... a vznikne písmeno."},
-    "tangled_lines": {"name": "Zamotaná klubka", "instr": "Sleduj čáry od předmětů k písmenům."},
-    "font_filtering": {"name": "Detektivka fontů", "instr": "Čti jen tučná písmena."},
-    "spatial_letter_mapping": {"name": "Písmena v krajině", "instr": "Písmena schovaná vedle zvířat."},
-    "classic_maze": {"name": "Labyrint", "instr": "Bludiště s očíslovanými východy."},
-    "musical_cipher": {"name": "Hudební šifra", "instr": "Noty jako písmena."},
-    "picture_math": {"name": "Obrázková matematika", "instr": "Rovnice s obrázky (2 jablka + 1 hruška)."},
-    "graph_reading": {"name": "Čtení z grafu", "instr": "Odečti hodnoty z grafu."},
-    "receipt_sorting": {"name": "Účtenka", "instr": "Seřaď položky podle ceny."},
-    "pair_elimination": {"name": "Klauni (Dvojice)", "instr": "Najdi postavy, které nemají dvojče."},
-    "sound_counting": {"name": "Počítání hlásek", "instr": "Spočítej všechna písmena A v bublinách."},
-    "nonogram": {"name": "Nonogram", "instr": "Malovaná křížovka s čísly na okrajích."},
-    "tetromino_cipher": {"name": "Tetris šifra", "instr": "Dílky tetrisu s písmeny."},
-    "word_search_leftover": {"name": "Osmisměrka (Zbytek)", "instr": "Písmena, která zbydou po vyškrtání slov."},
-    "gauge_sorting": {"name": "Měřáky a budíky", "instr": "Seřaď stroje podle hodnot na budících."},
-    "book_indexing": {"name": "Knižní šifra", "instr": "Vezmi X-té písmeno z názvu knihy."}
-}
+    def worker():
+        try:
+            for item in stream_book(client, tema, vybrane_klicky, cache=cache, local=local):
+                job["items"].append(item)
+        except Exception as e:
+            job["error"] = e
+        finally:
+            job["done"] = True
+
+    # bind_context: měření z vlákna se připíše do metrik této relace
+    threading.Thread(target=bind_context(worker), daemon=True).start()
+    return job
+
+@st.fragment(run_every=1)
+def stream_watch():
+    job = st.session_state.stream_job
+    nove = job["items"][len(st.session_state.book_data):]
+    if nove or job["done"]:
+        st.session_state.book_data.extend(nove)
+        if job["done"]:
+            st.session_state.stream_job = None
+            if job["error"]: st.session_state.stream_error = f"Chyba AI: {job['error']}"
+            if not st.session_state.book_data: st.session_state.generated = False
+        st.rerun() # Nové strany musí vykreslit celý editor
+    pozice = scheduler.position(st.session_state.session_id)
+    if pozice and not st.session_state.book_data: st.info(queue_status())
+    else: st.info(f"📡 Gemini píše... hotovo stran: {len(st.session_state.book_data)}")
+
+@st.fragment
+def page_editor(i):
+    puz = st.session_state.book_data[i]
+
+    # Získáme hodnoty bezpečně (pokud klíč chybí, vrátí prázdný řetězec)
+    # Zkoušíme i varianty s velkým písmenem, kdyby Gemini neposlechl
+    init_nadpis = puz.get('nadpis') or puz.get('Nadpis', '')
+    init_kod = puz.get('kod') or puz.get('Kod', '')
+    init_zadani = puz.get('zadani') or puz.get('Zadani', '')
+    init_prompt = puz.get('prompt') or puz.get('Prompt', '')
+
+    st.markdown(f"### Strana {i+1}")
+    with st.form(key=f"form_{i}", border=True):
+        # DŮLEŽITÉ: Každý input má unikátní 'key', aby se ID prvků nehádala.
+        # Do st.session_state.book_data se hodnoty zapíšou až po uložení formuláře
+
+        new_nadpis = st.text_input(
+            f"Nadpis strany {i+1}", 
+            value=init_nadpis, 
+            key=f"input_nadpis_{i}"
+        )
+        
+        c1, c2 = st.columns([1, 3])
+        with c1:
+            new_kod = st.text_input(
+                f"Tajný kód #{i+1}", 
+                value=init_kod, 
+                key=f"input_kod_{i}"
+            )
+        with c2:
+             st.info(f"Typ šifry: {puz.get('type_key', 'Neznámý')}")
+
+        # Kontrola proti pravidlům z katalogu (AI opravu už zkoušela při generování)
+        for chyba in validate_page(puz):
+            st.warning(f"⚠️ {chyba}")
+
+        new_zadani = st.text_area(
+            f"Text zadání #{i+1}", 
+            value=init_zadani, 
+            height=100,
+            key=f"input_zadani_{i}"
+        )
+        
+        new_prompt = st.text_area(
+            f"Prompt pro obrázek (EN) #{i+1}", 
+            value=init_prompt, 
+            height=70,
+            key=f"input_prompt_{i}"
+        )
+
+        st.markdown("👇 **Obrázek:**")
+        if puz.get('image_thumb'):
+            st.image(puz['image_thumb'], width=200, caption="🎨 Vygenerováno z promptu (nahráním vlastního se nahradí)")
+        elif puz.get('uploaded_image'):
+            st.caption(f"🖼️ Uložený obrázek: {puz['uploaded_image'].size / 1024:.0f} kB (nahráním nového se nahradí)")
+        # Po uložení dostane uploader nový klíč, aby Streamlit pustil nahraný soubor z paměti
+        verze = st.session_state.get(f"up_verze_{i}", 0)
+        uploaded_img = st.file_uploader(f"Nahrát vlastní (volitelné)", key=f"up_{i}_{verze}")
+
+        if st.form_submit_button("💾 Uložit stranu"):
+            # Aby se to propsalo do PDF, musíme aktualizovat hlavní data
+            puz['nadpis'] = new_nadpis
+            puz['kod'] = new_kod
+            puz['zadani'] = new_zadani
+            puz['prompt'] = new_prompt
+            if uploaded_img:
+                puz['uploaded_image'] = image_spill.put(uploaded_img.getvalue())
+                puz['image_source'] = "upload"
+                puz.pop('image_thumb', None)
+                st.session_state[f"up_verze_{i}"] = verze + 1
+            st.rerun(scope="fragment") # Varování z kontroly se přepočítají podle nových dat
 
 # ==========================================
-# 3. ROZHRANÍ - FÁZE 1: ZADÁNÍ
+# 2. ROZHRANÍ - FÁZE 1: ZADÁNÍ
 # ==========================================
 st.title("🛠️ Editor Únikovek (Human-in-the-Loop)")
 
@@ -154,247 +236,193 @@ with col1:
         vybrane_klicky = []
 
     manual_edit = st.checkbox("✏️ Chci upravit zadání a prompty před generováním", value=True)
+    lokalne = st.checkbox("🧮 Algoritmické šifry skládat lokálně (AI jen doplní text)", value=True)
+
+    # Souběžně = každá strana jako samostatný dotaz, chyba opakuje jen svou stranu.
+    # Stream = jeden dotaz, ale strany se v editoru objevují hned, jak je Gemini dopíše.
+    zpusob = st.radio("Způsob generování:", ["📦 Celá kniha najednou", "⚡ Strany souběžně", "📡 Streamovat do editoru"])
+    per_page = zpusob.startswith("⚡")
+    if per_page:
+        soubeznost = st.slider("Souběžných dotazů:", 1, 10, 4)
+        limit_za_s = st.number_input("Max. dotazů za sekundu (0 = bez limitu):", min_value=0.0, value=0.0, step=0.5)
 
     if st.button("🧠 Krok 1: Nechat AI vymyslet zadání", type="primary"):
         st.session_state.book_theme = tema
         st.session_state.book_data = [] # Reset
+        st.session_state.stream_job = None
+        st.session_state.stream_error = None
         
         # Logika výběru šifer
         if mod_vyberu.startswith("🤖"):
-            keys = list(PUZZLE_CATALOG.keys())
-            # Pokud je málo klíčů v katalogu, povolíme opakování
-            if len(keys) < pocet_sifer:
-                vybrane_klicky = [random.choice(keys) for _ in range(pocet_sifer)]
-            else:
-                vybrane_klicky = random.sample(keys, pocet_sifer)
+            vybrane_klicky = pick_puzzle_keys(pocet_sifer)
         
+        cache = None if obejit_cache else llm_cache
+        fronta = queued(scheduler, st.session_state.session_id)
+        if zpusob.startswith("📡"):
+            with collecting(st.session_state.metrics), fronta:
+                st.session_state.stream_job = start_stream(tema, vybrane_klicky, cache, lokalne)
+            st.session_state.generated = True
+            st.rerun()
+
         # Generování přes Gemini (Příběhový mód)
-        with st.spinner("Gemini přemýšlí..."):
-            mechanics_list_parts = []
-            for i, k in enumerate(vybrane_klicky):
-                puz = PUZZLE_CATALOG[k]
-                item_text = f"Strana {i+1}: {puz['name']}\nPravidlo: {puz['instr']}"
-                if "ukazka" in puz:
-                    item_text += f"\n\n❗ INSTRUKCE: Použij strukturu JSON z ukázky, ale NAHRAĎ obsah tématem '{tema}'!\nVZOR:\n{puz['ukazka']}"
-                mechanics_list_parts.append(item_text)
-
-            mechanics_list = "\n\n".join(mechanics_list_parts)
-            
-            master_prompt = f"""
-            Téma: "{tema}". Počet stran: {pocet_sifer}.
-            SEZNAM ŠIFER:\n{mechanics_list}
-            Styl: {MASTER_STYLE}
-            Vrať POUZE validní JSON pole objektů.
-            """
-            
+        with st.spinner("Gemini přemýšlí..."), collecting(st.session_state.metrics), fronta:
             try:
-                st.session_state.book_data = call_gemini_with_retry(master_prompt, 'gemini-2.5-flash-lite', expect_array=True)
-                # Doplníme typy šifer pro pozdější použití
-                for i, item in enumerate(st.session_state.book_data):
-                    item["type_key"] = vybrane_klicky[i]
-                
+                if per_page:
+                    st.session_state.book_data = run_with_queue(generate_book_per_page,
+                        client, tema, vybrane_klicky, concurrency=soubeznost, rate_per_sec=limit_za_s or None, cache=cache, local=lokalne)
+                else:
+                    st.session_state.book_data = run_with_queue(generate_book, client, tema, vybrane_klicky, cache=cache, local=lokalne)
                 st.session_state.generated = True
                 st.rerun() # Refresh stránky pro zobrazení editoru
             except Exception as e:
                 st.error(f"Chyba AI: {e}")
 
 # ==========================================
-# 4. ROZHRANÍ - FÁZE 2: EDITOR A PRODUKCE
+# 3. ROZHRANÍ - FÁZE 2: EDITOR A PRODUKCE
 # ==========================================
 with col2:
+    if st.session_state.stream_job is not None:
+        stream_watch()
+    if st.session_state.stream_error:
+        st.error(st.session_state.stream_error)
+
     # Kontrola, zda máme data
     if st.session_state.generated and st.session_state.book_data:
         st.header("2. Úprava a Generování")
         
         # --- 🕵️‍♂️ RENTGEN (DEBUG) ---
         # Tohle ti ukáže, co přesně AI poslala. Pokud je to tady prázdné, chyba je v Gemini.
-        with st.expander("🕵️‍♂️ Zobrazit surová data od AI (pro kontrolu)", expanded=False):
+        # JSON se skládá jen při zapnutém přepínači – u dlouhé knihy je to drahé
+        if st.toggle("🕵️‍♂️ Zobrazit surová data od AI (pro kontrolu)", value=False):
             st.json(st.session_state.book_data)
 
+        # --- 📊 MĚŘENÍ ---
+        # Kam šel čas: latence Gemini, pauzy mezi opakováními, parsování JSON, sazba stran
+        with st.expander("📊 Výkon a měření", expanded=False):
+            metriky = st.session_state.metrics
+            souhrn = metriky.summary()
+            if souhrn:
+                st.dataframe([{
+                    "Úsek": r["name"],
+                    "Počet": r["count"],
+                    "Celkem (ms)": round(r["total_s"] * 1000),
+                    "Max (ms)": round(r["max_s"] * 1000),
+                } for r in souhrn], hide_index=True)
+            st.caption(
+                f"Opakování Gemini: {metriky.counters['gemini.retries']} · "
+                f"Opravy stran: {metriky.counters['pages.repair_attempts']} (selhalo {metriky.counters['pages.repair_failures']}) · "
+                f"Cache zásahy/minutí: {metriky.counters['cache.hit']}/{metriky.counters['cache.miss']}"
+            )
+            # Plánovač je společný pro všechny relace – čísla jsou za celý proces
+            st.caption(
+                f"Fronta (všichni): dotazů {scheduler.stats['submitted']} · "
+                f"sloučeno stejných {scheduler.stats['deduplicated']} · odmítnuto 429 {scheduler.stats['rate_limited']}"
+            )
+            volani = metriky.spans_named("gemini.call")
+            if volani:
+                st.markdown("**Dotazy na Gemini**")
+                st.dataframe([{
+                    "Model": v.get("model"),
+                    "Prompt (znaků)": v.get("prompt_chars"),
+                    "Odpověď (znaků)": v.get("response_chars"),
+                    "Čas (ms)": round(v["seconds"] * 1000),
+                    "Chyba": v.get("error", ""),
+                } for v in volani[-50:]], hide_index=True)
+            # Jen úseky posledního generování PDF; přírůstková sazba v něm má jen změněné strany
+            strany = metriky.spans_named("pdf.page", since=st.session_state.get("pdf_run_seq", 0))
+            if strany:
+                st.markdown("**Sazba stran (poslední běh)**")
+                st.bar_chart({f"{s['strana']:03d}": s["seconds"] * 1000 for s in strany})
+            st.download_button("📥 Stáhnout měření (JSON)", metriky.to_json(), file_name="mereni.json", mime="application/json")
+            if st.button("Vynulovat měření"):
+                metriky.reset()
+
+        # --- 🎨 OBRÁZKY Z AI ---
+        # Strany bez vlastního obrázku dostanou obrázek z promptu; stejný prompt se bere z cache
+        with st.expander("🎨 Vygenerovat obrázky z promptů", expanded=False):
+            c1, c2 = st.columns(2)
+            with c1:
+                obr_soubeznost = st.slider("Souběžně generovaných obrázků:", 1, 8, 4)
+            with c2:
+                obr_znovu = st.checkbox("Přegenerovat i obrázky z cache", value=False)
+            if st.button("🎨 Vygenerovat obrázky", disabled=st.session_state.stream_job is not None):
+                hotovo = []
+                postup = st.progress(0.0)
+                stran = len(st.session_state.book_data)
+                with collecting(st.session_state.metrics):
+                    vysledky = run_polling(
+                        lambda: postup.progress(len(hotovo) / stran, text=f"Hotovo obrázků: {len(hotovo)} z {stran}"),
+                        generate_images, get_image_backend(), st.session_state.book_data, get_image_store(),
+                        concurrency=obr_soubeznost, force=obr_znovu, on_done=hotovo.append)
+                postup.progress(1.0, text="✅ Obrázky hotové")
+                chyby = [r for r in vysledky if r["stav"] == "chyba"]
+                if chyby: st.warning(f"⚠️ Nepovedlo se stran: {len(chyby)} – zkus to znovu, hotové se vezmou z cache.")
+                st.dataframe([{"Strana": r["strana"], "Stav": r["stav"], "Chyba": r.get("chyba", "")} for r in vysledky], hide_index=True)
+
         # --- EDITOR ---
         if manual_edit:
-            st.info("📝 Zde uprav texty. Změny se ukládají automaticky.")
+            st.info("📝 Zde uprav texty. Změny strany se uloží tlačítkem 💾 pod ní.")
             
-            # Procházíme data a vytváříme formuláře
-            # Používáme i jako index, aby se ID prvků nehádala
-            for i, puz in enumerate(st.session_state.book_data):
-                
-                # Získáme hodnoty bezpečně (pokud klíč chybí, vrátí prázdný řetězec)
-                # Zkoušíme i varianty s velkým písmenem, kdyby Gemini neposlechl
-                init_nadpis = puz.get('nadpis') or puz.get('Nadpis', '')
-                init_kod = puz.get('kod') or puz.get('Kod', '')
-                init_zadani = puz.get('zadani') or puz.get('Zadani', '')
-                init_prompt = puz.get('prompt') or puz.get('Prompt', '')
-
-                st.markdown(f"### Strana {i+1}")
-                with st.container(border=True):
-                    # DŮLEŽITÉ: Každý input má unikátní 'key'. 
-                    # Když ho změníš, hodnota se zapíše zpět do st.session_state.book_data
-                    
-                    new_nadpis = st.text_input(
-                        f"Nadpis strany {i+1}", 
-                        value=init_nadpis, 
-                        key=f"input_nadpis_{i}"
-                    )
-                    
-                    c1, c2 = st.columns([1, 3])
-                    with c1:
-                        new_kod = st.text_input(
-                            f"Tajný kód #{i+1}", 
-                            value=init_kod, 
-                            key=f"input_kod_{i}"
-                        )
-                    with c2:
-                         st.info(f"Typ šifry: {puz.get('type_key', 'Neznámý')}")
-
-                    new_zadani = st.text_area(
-                        f"Text zadání #{i+1}", 
-                        value=init_zadani, 
-                        height=100,
-                        key=f"input_zadani_{i}"
-                    )
-                    
-                    new_prompt = st.text_area(
-                        f"Prompt pro obrázek (EN) #{i+1}", 
-                        value=init_prompt, 
-                        height=70,
-                        key=f"input_prompt_{i}"
-                    )
-
-                    # OKAMŽITÉ ULOŽENÍ ZMĚN DO SESSION STATE
-                    # Aby se to propsalo do PDF, musíme aktualizovat hlavní data
-                    st.session_state.book_data[i]['nadpis'] = new_nadpis
-                    st.session_state.book_data[i]['kod'] = new_kod
-                    st.session_state.book_data[i]['zadani'] = new_zadani
-                    st.session_state.book_data[i]['prompt'] = new_prompt
-                    
-                    st.markdown("👇 **Obrázek:**")
-                    uploaded_img = st.file_uploader(f"Nahrát vlastní (volitelné)", key=f"up_{i}")
-                    if uploaded_img:
-                        st.session_state.book_data[i]['uploaded_image'] = uploaded_img
+            # Každá strana je samostatný fragment s formulářem: psaní nic nespouští
+            # a uložení přepočítá jen tuhle stranu, ne celou aplikaci
+            for i in range(len(st.session_state.book_data)):
+                page_editor(i)
 
         st.markdown("---")
         
         # --- TLAČÍTKO PRO FINÁLNÍ GENERACI ---
-        if st.button("🚀 Vygenerovat PDF", type="primary"):
+        # Velká kniha se sází po dávkách přes dočasné soubory – paměť při sazbě neroste s počtem stran
+        velka_kniha = st.checkbox("📚 Velká kniha: sázet po dávkách přes disk (šetří paměť při sazbě, bez cache stran)",
+                                  value=is_large_book(st.session_state.book_data),
+                                  help="Hotové PDF ke stažení drží Streamlit v paměti celé – úspora se týká jen sazby.")
+        if st.button("🚀 Vygenerovat PDF", type="primary", disabled=st.session_state.stream_job is not None):
             
             # Příprava fontů
-            font_path = "fonts/DejaVuSans.ttf"
-            font_bold_path = "fonts/DejaVuSans-Bold.ttf"
-            if not os.path.exists(font_path):
+            if not fonts_available():
                 st.error("Chyba: Chybí fonty ve složce fonts/!")
                 st.stop()
 
-            pdf = FPDF()
-            pdf.add_font("DejaVu", "", font_path)
-            pdf.add_font("DejaVu", "B", font_bold_path)
-
             status_text = st.empty()
             progress_bar = st.progress(0)
 
-            for i, puz in enumerate(st.session_state.book_data):
-                status_text.text(f"Tisknu stranu {i+1}...")
-                
-                pdf.add_page()
-                
-                # --- LOGIKA STYLU (TABULKA vs TEXT) ---
-                is_grid_layout = "|" in puz['zadani'] and "---" in puz['zadani']
-                
-                # 1. NADPIS
-                pdf.set_xy(10, 20)
-                pdf.set_font("DejaVu", "B", 26)
-                pdf.set_text_color(0, 0, 0)
-                pdf.cell(0, 15, puz['nadpis'], ln=True, align="C")
-                
-                aktualni_y = 45
-
-                # 2. ZADÁNÍ
-                if is_grid_layout:
-                    # Rozparsování Markdown tabulky pro PDF
-                    pdf.set_font("DejaVu", "", 12)
-                    lines = puz['zadani'].split('\n')
-                    table_data = []
-                    intro_text = ""
-                    
-                    for line in lines:
-                        if "|" in line:
-                            cells = [c.strip() for c in line.strip().strip('|').split('|')]
-                            if "---" not in cells[0]: table_data.append(cells)
-                        else:
-                            if line.strip(): intro_text += line + "\n"
-                    
-                    if intro_text:
-                        pdf.multi_cell(180, 6, intro_text, align="C")
-                        aktualni_y = pdf.get_y() + 5
-                        
-                    if table_data:
-                        col_w = 180 / len(table_data[0])
-                        row_h = 14 # Vyšší řádky
-                        pdf.set_x(15)
-                        
-                        # Hlavička
-                        pdf.set_font("DejaVu", "B", 12)
-                        for cell in table_data[0]:
-                            pdf.cell(col_w, row_h, cell, border=1, align="C")
-                        pdf.ln()
-                        
-                        # Tělo tabulky
-                        pdf.set_font("DejaVu", "", 12)
-                        for row in table_data[1:]:
-                            pdf.set_x(15)
-                            for cell in row:
-                                txt = cell.replace("**", "")
-                                is_bold = "**" in cell
-                                pdf.set_font("DejaVu", "B" if is_bold else "", 12)
-                                pdf.cell(col_w, row_h, txt, border=1, align="C")
-                            pdf.ln()
-                        aktualni_y = pdf.get_y() + 10
+            def on_page(i, total):
+                status_text.text(f"Tisknu {'stranu' if velka_kniha else 'změněnou stranu'} {i+1} z {total}...")
+                progress_bar.progress(i / total)
 
-                else:
-                    # Klasický text
-                    pdf.set_xy(15, aktualni_y)
-                    pdf.set_font("DejaVu", "", 14)
-                    clean_text = puz['zadani'].replace("**", "")
-                    pdf.multi_cell(180, 8, clean_text, align="C")
-                    aktualni_y = pdf.get_y() + 10
-
-                # 3. OBRÁZEK
-                uploaded_file = puz.get('uploaded_image')
-                if uploaded_file:
-                    temp_img = f"temp_{i}.png"
-                    with open(temp_img, "wb") as f: f.write(uploaded_file.getbuffer())
-                    
-                    # Logika pro umístění
-                    space_left = 240 - aktualni_y
-                    if space_left > 50:
-                        pdf.image(temp_img, x=25, y=aktualni_y, w=160)
-                    
-                    os.remove(temp_img)
-                else:
-                    # Placeholder, když není obrázek
-                    pdf.set_xy(25, aktualni_y)
-                    pdf.set_font("DejaVu", "", 10)
-                    pdf.set_text_color(150, 150, 150)
-                    pdf.multi_cell(160, 10, f"(Obrázek chybí - zkopíruj si prompt):\n{puz['prompt']}", border=1, align="C")
-
-                # 4. KÓD (Styl Benny - Závorky)
-                pdf.set_xy(10, 255)
-                pdf.set_font("DejaVu", "B", 20)
-                pdf.set_text_color(0, 0, 0)
-                
-                delka = len(str(puz['kod']))
-                zavorky = "   ".join(["[      ]"] * delka)
-                pdf.cell(0, 10, f"TAJNÝ KÓD:   {zavorky}", ln=True, align="C")
-                
-                progress_bar.progress((i + 1) / len(st.session_state.book_data))
-
-            # EXPORT
             pdf_name = f"Unikovka_{sanitize_filename(st.session_state.book_theme)}.pdf"
-            pdf.output(pdf_name)
+            image_report = []
+            render_stats = {}
+            st.session_state.pdf_run_seq = st.session_state.metrics.seq
+            with collecting(st.session_state.metrics):
+                if velka_kniha:
+                    # Během sazby je PDF v paměti jen do SPOOL_MEMORY_BYTES, větší jde do dočasného souboru.
+                    # st.download_button ale SpooledTemporaryFile nebere a stahovaný soubor stejně drží
+                    # celý v paměti – hotové PDF proto načteme jako bytes.
+                    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+                        render_book_chunked(st.session_state.book_data, spool, on_page=on_page, report=image_report)
+                        spool.seek(0)
+                        pdf_data = spool.read()
+                else:
+                    # EXPORT – PDF vzniká jen v paměti, na disk se nic nezapisuje.
+                    # Sází se jen strany, které se od minula změnily, zbytek jde z cache
+                    pdf_data = render_book_incremental(st.session_state.book_data, on_page=on_page, report=image_report, stats=render_stats)
+            progress_bar.progress(1.0)
             
-            status_text.text("✅ Hotovo!")
-            with open(pdf_name, "rb") as f:
-                st.download_button("📥 Stáhnout PDF", f, file_name=pdf_name, mime="application/pdf")
+            if velka_kniha: status_text.text(f"✅ Hotovo! Vysázeno stran: {len(st.session_state.book_data)} (po dávkách)")
+            else: status_text.text(f"✅ Hotovo! Vysázeno stran: {render_stats['rendered']}, z cache: {render_stats['reused']}")
+            if image_report:
+                with st.expander("🖼️ Úspora na obrázcích", expanded=False):
+                    st.dataframe([{
+                        "Strana": r["strana"],
+                        "Formát": r["format"],
+                        "Původně (kB)": round(r["orig_bytes"] / 1024),
+                        "V PDF (kB)": round(r["bytes"] / 1024),
+                        "Ušetřeno (kB)": round((r["orig_bytes"] - r["bytes"]) / 1024),
+                        "Úprava (ms)": round(r["seconds"] * 1000),
+                        "Ušetřený čas (ms)": round(r["saved_seconds"] * 1000),
+                        "Z cache": "✅" if r["cached"] else "",
+                    } for r in image_report], hide_index=True)
+            st.download_button("📥 Stáhnout PDF", pdf_data, file_name=pdf_name, mime="application/pdf")
 
     elif not st.session_state.generated:
         st.info("👈 Vlevo klikni na 'Krok 1' pro vygenerování zadání.")
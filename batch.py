@@ -0,0 +1,174 @@
+# ==========================================
+# DÁVKOVÁ TOVÁRNA NA ÚNIKOVKY (CLI)
+# Vygeneruje víc knih najednou bez Streamlitu. Zadání se stahují
+# z Gemini ve vláknech, sazba PDF běží v procesním poolu.
+#
+#   python batch.py --tema Piráti --tema Vesmír --pocet 5 --out vystup/
+#   python batch.py --jobs ukoly.json --workers 8
+#   python batch.py --jobs ukoly.json --queue-rate 2    # společný limit, knihy se střídají
+#   python batch.py --tema Piráti --images --fake       # i s obrázky (offline falešný model)
+#
+# Soubor s úkoly je JSON pole objektů:
+#   [{"tema": "Piráti", "sifry": ["caesar", "morse"]}, {"tema": "Zvířata", "pocet": 4}]
+# ==========================================
+import argparse
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from engine import DEFAULT_MODEL, PUZZLE_CATALOG, make_client, shared_client, sanitize_filename, pick_puzzle_keys, generate_book, generate_book_per_page
+from pdf_render import fonts_available, write_book
+from llm_cache import DEFAULT_CACHE_DIR, ResponseCache
+from fake_gemini import FakeClient, FakeImageBackend
+from image_gen import DEFAULT_IMAGE_MODEL, GeminiImageBackend, GeneratedImageStore, generate_images
+from metrics import configure_log
+from scheduler import DEFAULT_BURST, Scheduler, bind_session
+
+def load_jobs(args):
+    jobs = []
+    if args.jobs:
+        with open(args.jobs, encoding="utf-8") as f: jobs.extend(json.load(f))
+    for tema in args.tema or []:
+        jobs.append({"tema": tema, "pocet": args.pocet})
+    return jobs
+
+def resolve_keys(job, rng):
+    keys = job.get("sifry")
+    if keys:
+        nezname = [k for k in keys if k not in PUZZLE_CATALOG]
+        if nezname: raise ValueError(f"Neznámé šifry: {', '.join(nezname)}")
+        return list(keys)
+    return pick_puzzle_keys(int(job.get("pocet", 3)), rng)
+
+def output_stem(out_dir, idx, tema):
+    # Index v názvu, aby se knihy se stejným tématem nepřepisovaly
+    return os.path.join(out_dir, f"{idx:03d}_Unikovka_{sanitize_filename(tema)}")
+
+def run(args):
+    jobs = load_jobs(args)
+    if not jobs:
+        print("Žádné úkoly – zadej --jobs nebo --tema.", file=sys.stderr)
+        return 2
+    if not fonts_available():
+        print("Chyba: Chybí fonty ve složce fonts/!", file=sys.stderr)
+        return 2
+
+    if args.fake:
+        client = FakeClient(quota=args.fake_quota)
+    elif args.base_url:
+        # Lokální náhrada API (fake_server.py) klíč nekontroluje
+        client = make_client(os.environ.get("GOOGLE_API_KEY", "local"), base_url=args.base_url)
+    else:
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            print("Chyba: Nastav proměnnou prostředí GOOGLE_API_KEY.", file=sys.stderr)
+            return 2
+        client = shared_client(api_key)
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.metrics_log:
+        # Měření z engine/pdf_render jako JSON řádky (jeden span na řádek)
+        configure_log(args.metrics_log)
+    cache = None if args.no_cache else ResponseCache(args.cache_dir)
+    rng = random.Random(args.seed)
+    planned = [(idx, job["tema"], resolve_keys(job, rng)) for idx, job in enumerate(jobs)]
+    # Seed lokálních šifer – se stejným --seed vzniknou stejné knihy
+    seeds = [rng.randrange(2 ** 32) for _ in planned]
+    # Každá kniha je vlastní relace plánovače – dotazy knih se střídají pod společným limitem
+    scheduler = Scheduler(args.queue_rate, args.queue_burst) if args.queue_rate else None
+
+    image_backend = None
+    if args.images:
+        image_backend = FakeImageBackend() if args.fake else GeminiImageBackend(client, args.image_model)
+        image_store = GeneratedImageStore()
+
+    def with_images(generate):
+        # Obrázky se generují ve stejném vlákně hned po textu knihy, před sazbou
+        def build(*a, **kw):
+            book_data = generate(*a, **kw)
+            if image_backend:
+                for r in generate_images(image_backend, book_data, image_store, concurrency=args.image_concurrency):
+                    if r["stav"] == "chyba": print(f"  Obrázek strany {r['strana']} ({a[1]}): {r['chyba']}", file=sys.stderr)
+            return book_data
+        return build
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=args.gen_workers) as gen_pool, \
+         ProcessPoolExecutor(max_workers=args.workers) as render_pool:
+        if args.per_page:
+            gen_futures = {
+                gen_pool.submit(bind_session(scheduler, f"kniha-{idx}", with_images(generate_book_per_page)), client, tema, keys, args.model,
+                                concurrency=args.concurrency, rate_per_sec=args.rate, cache=cache,
+                                local=not args.no_local, seed=seeds[idx]): (idx, tema)
+                for idx, tema, keys in planned
+            }
+        else:
+            gen_futures = {
+                gen_pool.submit(bind_session(scheduler, f"kniha-{idx}", with_images(generate_book)), client, tema, keys, args.model, cache=cache,
+                               local=not args.no_local, seed=seeds[idx]): (idx, tema)
+                for idx, tema, keys in planned
+            }
+
+        # Jakmile je zadání hotové, hned ho pošleme do sazby
+        render_futures = {}
+        for fut in as_completed(gen_futures):
+            idx, tema = gen_futures[fut]
+            try:
+                book_data = fut.result()
+            except Exception as e:
+                failures += 1
+                print(f"[{idx:03d}] Chyba AI ({tema}): {e}", file=sys.stderr)
+                continue
+
+            stem = output_stem(args.out, idx, tema)
+            with open(stem + ".json", "w", encoding="utf-8") as f:
+                # Obrázky (SpilledImage) se do JSON zapíšou jako cesta k souboru
+                json.dump({"tema": tema, "book_data": book_data}, f, ensure_ascii=False, indent=2, default=lambda o: getattr(o, "path", str(o)))
+            render_futures[render_pool.submit(write_book, book_data, stem + ".pdf", args.chunk_pages)] = (idx, tema)
+
+        for fut in as_completed(render_futures):
+            idx, tema = render_futures[fut]
+            try:
+                print(f"[{idx:03d}] ✅ {fut.result()}")
+            except Exception as e:
+                failures += 1
+                print(f"[{idx:03d}] Chyba PDF ({tema}): {e}", file=sys.stderr)
+
+    print(f"Hotovo: {len(planned) - failures}/{len(planned)} knih.")
+    if cache: print(f"Cache: {cache.stats()}")
+    if scheduler: print(f"Plánovač: {dict(scheduler.stats)}")
+    if args.fake and args.fake_quota: print(f"Falešné API odmítlo (429): {client.rejected}")
+    return 1 if failures else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dávkové generování únikovek do PDF.")
+    parser.add_argument("--jobs", help="JSON soubor se seznamem úkolů")
+    parser.add_argument("--tema", action="append", help="Téma knihy (lze opakovat)")
+    parser.add_argument("--pocet", type=int, default=3, help="Počet stran pro --tema (default 3)")
+    parser.add_argument("--out", default="vystup", help="Výstupní složka")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Počet procesů pro sazbu PDF")
+    parser.add_argument("--gen-workers", type=int, default=4, help="Počet souběžných dotazů na Gemini")
+    parser.add_argument("--per-page", action="store_true", help="Generovat každou stranu samostatným souběžným dotazem")
+    parser.add_argument("--concurrency", type=int, default=4, help="Souběžných dotazů na stranu knihy (s --per-page)")
+    parser.add_argument("--rate", type=float, help="Max. dotazů za sekundu na knihu (s --per-page)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Složka s cache odpovědí AI")
+    parser.add_argument("--no-cache", action="store_true", help="Obejít cache odpovědí AI")
+    parser.add_argument("--fake", action="store_true", help="Místo Gemini použít offline falešného klienta")
+    parser.add_argument("--fake-quota", type=float, help="Falešný klient nad tento počet dotazů/s vrací 429")
+    parser.add_argument("--base-url", help="Adresa Gemini API, např. lokální fake_server.py")
+    parser.add_argument("--queue-rate", type=float, help="Společný limit dotazů/s přes plánovač (fér mezi knihami)")
+    parser.add_argument("--queue-burst", type=float, help=f"Kolik dotazů smí plánovač poslat naráz (default {DEFAULT_BURST:g})")
+    parser.add_argument("--no-local", action="store_true", help="I algoritmické šifry nechat vymyslet AI")
+    parser.add_argument("--metrics-log", help="Soubor pro měření ve formátu JSON lines")
+    parser.add_argument("--images", action="store_true", help="Vygenerovat obrázky z promptů stran (s --fake offline)")
+    parser.add_argument("--image-concurrency", type=int, default=4, help="Souběžně generovaných obrázků na knihu")
+    parser.add_argument("--image-model", default=DEFAULT_IMAGE_MODEL)
+    parser.add_argument("--chunk-pages", type=int, help="Sázet po dávkách N stran přes disk (velké knihy, stálá paměť)")
+    parser.add_argument("--seed", type=int, help="Seed pro náhodný výběr šifer")
+    return run(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
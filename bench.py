@@ -0,0 +1,164 @@
+# ==========================================
+# MĚŘENÍ VÝKONU
+# Projede sestavení promptu, dotaz přes call_gemini_with_retry (fronta,
+# vytažení JSON) a sazbu PDF proti falešnému Gemini klientovi (bez sítě
+# a API klíče) pro knihy různé délky, s obrázky různé velikosti i bez nich
+# a s tabulkovým i textovým zadáním. Každá strana dostane vlastní obrázek
+# (jiný seed), jinak by cache obrázků měřila jen první stranu. Výsledek jde
+# do JSON, aby se daly porovnat dvě verze:
+#
+#   python bench.py --out bench_results.json
+#   python bench.py --sizes 1 10 --no-images
+#   python bench.py --sizes 10 --image-sizes 800x600 4000x3000
+#
+# Každý případ běží v čerstvém procesu, aby špička paměti nebyla ovlivněná
+# předchozími běhy.
+# ==========================================
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from catalog import PUZZLE_CATALOG
+from engine import DEFAULT_MODEL, build_master_prompt, call_gemini_with_retry
+from fake_gemini import FakeClient
+from metrics import Metrics, collecting
+
+DEFAULT_SIZES = [1, 10, 100, 1000]
+DEFAULT_IMAGE_SIZES = ["2400x1800"]
+TEMA = "Piráti"
+
+GRID_ZADANI = "\n".join([
+    "Najdi správný předmět pro každou postavu:",
+    "| Postava | 1 | 2 | 3 |",
+    "|---|---|---|---|",
+    *[f"| Pirát {r} | kotva | **mince** | mapa |" for r in range(1, 5)],
+])
+
+def image_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+def make_image(width=2400, height=1800, seed=0):
+    # Barevný přechod jako náhrada fotky z mobilu – hodně barev, takže skončí jako JPEG.
+    # Seed posune střed přechodu a prohodí kanály, takže každá strana má jiná data.
+    from PIL import Image, ImageChops, ImageOps
+    rng = random.Random(seed)
+    img = Image.radial_gradient("L").resize((width, height))
+    img = ImageChops.offset(img, rng.randrange(width), rng.randrange(height))
+    channels = [img, ImageOps.flip(img), ImageOps.mirror(img)]
+    rng.shuffle(channels)
+    img = Image.merge("RGB", channels)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def run_case(pages, images, grid):
+    # images = None nebo (šířka, výška)
+    from pdf_render import render_book
+
+    keys = list(itertools.islice(itertools.cycle(PUZZLE_CATALOG), pages))
+    # Obrázky se připraví předem, ať se do času ani paměti nepočítá jejich výroba
+    image_data = [make_image(*images, seed=i) for i in range(pages)] if images else None
+    client = FakeClient()
+    metrics = Metrics()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    t = time.perf_counter()
+    prompt = build_master_prompt(TEMA, keys)
+    prompt_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    with collecting(metrics):
+        book_data = call_gemini_with_retry(client, prompt, DEFAULT_MODEL)
+    call_s = time.perf_counter() - t
+    extract_s = sum(s["seconds"] for s in metrics.spans_named("json.extract"))
+
+    for i, (item, key) in enumerate(zip(book_data, keys)):
+        item["type_key"] = key
+        if grid: item["zadani"] = GRID_ZADANI
+        # BytesIO má getvalue() stejně jako Streamlit UploadedFile
+        if images: item["uploaded_image"] = io.BytesIO(image_data[i])
+
+    t = time.perf_counter()
+    pdf_bytes = render_book(book_data)
+    render_s = time.perf_counter() - t
+
+    wall_s = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "pages": pages,
+        "images": bool(images),
+        "image_size": "x".join(map(str, images)) if images else None,
+        "image_bytes": sum(map(len, image_data)) if images else 0,
+        "grid": grid,
+        "prompt_chars": len(prompt),
+        "response_chars": sum(s.get("response_chars", 0) for s in metrics.spans_named("gemini.call")),
+        "prompt_s": round(prompt_s, 6),
+        "call_s": round(call_s, 6),
+        "extract_s": round(extract_s, 6),
+        "render_s": round(render_s, 6),
+        "wall_s": round(wall_s, 6),
+        "peak_traced_bytes": peak,
+        # ru_maxrss je v Linuxu v kB, na macOS v bajtech
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "pdf_bytes": len(pdf_bytes),
+    }
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Měření výkonu generátoru únikovek.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Počty stran knihy")
+    parser.add_argument("--no-images", action="store_true", help="Vynechat případy s obrázky")
+    parser.add_argument("--image-sizes", type=image_size, nargs="+", default=[image_size(s) for s in DEFAULT_IMAGE_SIZES],
+                        help="Rozměry obrázků, např. 800x600 2400x1800")
+    parser.add_argument("--no-grid", action="store_true", help="Vynechat případy s tabulkovým zadáním")
+    parser.add_argument("--out", default="bench_results.json", help="Výstupní JSON soubor")
+    args = parser.parse_args(argv)
+
+    cases = [(n, img, grid) for n in args.sizes
+             for img in ([None] if args.no_images else [None, *args.image_sizes])
+             for grid in ([False] if args.no_grid else [False, True])]
+
+    results = []
+    for pages, images, grid in cases:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            res = pool.submit(run_case, pages, images, grid).result()
+        results.append(res)
+        print(f"{pages:>5} stran  obrázky={res['image_size'] or 'ne':<9} tabulka={'ano' if grid else 'ne ':<3} "
+              f"{res['wall_s']:8.3f} s  {res['peak_traced_bytes'] / 2**20:8.1f} MB  PDF {res['pdf_bytes'] / 1024:9.0f} kB")
+
+    report = {
+        "revision": git_revision(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Výsledky: {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# ==========================================
+# KATALOG ŠIFER
+# Popisy typů šifer a styl ilustrací. Samostatně, aby ho mohly
+# používat engine.py i lokální generátory bez kruhových importů.
+# ==========================================
+MASTER_STYLE = """
+A cheerful children's book illustration in a clean vector art style.
+Must have thick prominent outlines, flat vibrant colors, and a friendly, cute design.
+Clean solid white background. NO shadows, NO gradients, NO realism.
+"""
+
+PUZZLE_CATALOG = {
+    "matching": {
+        "name": "Přiřazování v tabulce (Grid Matching) – bez slov",
+        "instr": (
+            "CÍL: Výsledná šifra musí být řešitelná ČISTĚ Z OBRÁZKU (bez slov). "
+            "V obrázku NESMÍ být žádná písmena ani slova. ČÍSLICE JSOU POVOLENÉ jen v hlavičce (1, 2, 3)."
+            "\n\n"
+            "LAYOUT (PŘESNĚ): Vytvoř tabulku se 4 řádky + 1 hlavičkový řádek. "
+            "V hlavičce jsou POUZE tři buňky s čísly 1, 2, 3. "
+            "Pod hlavičkou jsou 4 řádky. Každý řádek má vlevo 1 velkou buňku s HLAVNÍ POSTAVOU TÉMATU "
+            "a vpravo přesně 3 buňky možností (sloupce 1/2/3). "
+            "\n\n"
+            "NÁPOVĚDA (BADGE): V levé buňce u postavy musí být malý piktogram (badge), který určuje správnou volbu. "
+            "Badge musí být tématický (např. pro Piráty to bude 'kotva', 'mince', ne 'hvězda' z ukázky)."
+            "\n\n"
+            "ADAPTACE TÉMATU (CRITICAL): Ukázka níže používá astronauty. "
+            "Pokud je tvé téma 'Piráti', v promptu nahraď 'astronaut' za 'pirate', 'helmet' za 'pirate hat'. "
+            "Pokud je téma 'Zvířata', použij 'animals'. NEKOPÍRUJ ASTRONAUTY!"
+            "\n\n"
+            "KÓD: Číslo 1–3, délka 4. Čti shora dolů podle správného sloupce."
+            "\n\n"
+            "PROMPT: Anglický prompt musí explicitně popsat mřížku. Místo slova 'astronaut' použij postavy z aktuálního příběhu."
+        ),
+        # Kontrola výstupu AI (validators.py)
+        "kod_format": r"[1-3]{4}",
+        "ukazka": """
+        {
+          "nadpis": "Kód k únikovému modulu",
+          "zadani": "Najdi podle symbolu správný předmět pro každou postavu a získej kód.",
+          "kod": "2312",
+          "prompt": "Cheerful clean vector illustration, thick outlines, flat vibrant colors, solid white background. A strict table grid: ONE left column for characters + THREE option columns. Header row: ONLY digits 1, 2, 3 centered above options. Below header: exactly 4 rows. Each row: Left cell contains a [THEME_CHARACTER_HEAD] icon AND a small clue badge icon inside (e.g., specific tool or symbol). To the right: 3 item cells. ABSOLUTELY NO WORDS. Digits 1-3 allowed only in header. Each row's clue badge matches exactly one item."
+        }
+        """
+    },
+    "hidden_objects": {
+        "name": "Skryté předměty (Počítání)", 
+        "instr": "IGNORUJ POKYN PRO SLOVNÍ KÓD! Zde MUSÍ být kód POUZE ČÍSLO. Počet číslic v kódu se musí rovnat počtu otázek! Do textu 'zadani' VYPIŠ OČÍSLOVANÝ SEZNAM otázek.",
+        "kod_format": r"\d+",
+        "kod_per_question": True,
+        "ukazka": """
+        {
+          "nadpis": "Ztracené hračky",
+          "zadani": "Spočítejte předměty na obrázku a získejte tajný kód:\n1. Kolik je tam medvídků?\n2. Kolik vidíš autíček?\n3. Kolik je tam balónů?",
+          "kod": "524",
+          "prompt": "A messy playroom floor with scattered toys. Specifically visible: 5 teddy bears, 2 toy cars, and 4 balloons among other items."
+        }
+        """
+    },
+    "logic_elimination": {"name": "Logická vyřazovačka", "instr": "4 dveře a 3 logické nápovědy. Zbydou jen jedny správné."},
+    "fill_level": {"name": "Lektvary (Řazení)", "instr": "4 nádoby, každá jinak plná. Kód vznikne seřazením od nejplnější."},
+    "shadows": {"name": "Stínové pexeso", "instr": "Spojování předmětů s jejich stíny."},
+    "pigpen_cipher": {"name": "Šifra symbolů (Ikony)", "instr": "Použij jednoduché ikony (slunce, mrak...) a vypiš legendu."},
+    "caesar": {"name": "Posunutá abeceda (Caesar)", "instr": "Text zašifrovaný posunem v abecedě."},
+    "morse": {"name": "Zvuková Morseovka", "instr": "Zvířata dělají krátké a dlouhé zvuky."},
+    "dirty_keypad": {"name": "Forenzní stopy", "instr": "4 tlačítka, každé jinak špinavé. Seřaď od nejšpinavějšího."},
+    "diagonal_acrostic": {"name": "Diagonální čtení", "instr": "Seznam 4 slov. Čti diagonálně (1. písmeno 1. slova...)."},
+    "mirror_writing": {"name": "Zrcadlové písmo", "instr": "Tajné slovo napsané zrcadlově pozpátku."},
+    "matrix_indexing": {"name": "Dvojitá mřížka", "instr": "Mřížka s písmeny a mřížka s čísly."},
+    "grid_navigation": {"name": "Bludiště s šipkami", "instr": "Mřížka s písmeny a šipky navigující ke kódu."},
+    "camouflaged_numbers": {"name": "Maskovaná čísla", "instr": "Čísla ukrytá v geometrických tvarech."},
+    "feature_filtering": {"name": "Filtrování mincí", "instr": "Čtení písmen jen pod mincemi určité barvy."},
+    "size_sorting": {"name": "Porovnávání velikostí", "instr": "Seřazení předmětů podle velikosti."},
+    "word_structure": {"name": "Lingvistická detektivka", "instr": "Hledání slova podle gramatických pravidel."},
+    "composite_symbols": {"name": "Skládané symboly", "instr": "Matematika se symboly."},
+    "coordinate_drawing": {"name": "Kreslení souřadnic", "instr": "Vybarvi A1, B2... a vznikne písmeno."},
+    "tangled_lines": {"name": "Zamotaná klubka", "instr": "Sleduj čáry od předmětů k písmenům."},
+    "font_filtering": {"name": "Detektivka fontů", "instr": "Čti jen tučná písmena."},
+    "spatial_letter_mapping": {"name": "Písmena v krajině", "instr": "Písmena schovaná vedle zvířat."},
+    "classic_maze": {"name": "Labyrint", "instr": "Bludiště s očíslovanými východy."},
+    "musical_cipher": {"name": "Hudební šifra", "instr": "Noty jako písmena."},
+    "picture_math": {"name": "Obrázková matematika", "instr": "Rovnice s obrázky (2 jablka + 1 hruška)."},
+    "graph_reading": {"name": "Čtení z grafu", "instr": "Odečti hodnoty z grafu."},
+    "receipt_sorting": {"name": "Účtenka", "instr": "Seřaď položky podle ceny."},
+    "pair_elimination": {"name": "Klauni (Dvojice)", "instr": "Najdi postavy, které nemají dvojče."},
+    "sound_counting": {"name": "Počítání hlásek", "instr": "Spočítej všechna písmena A v bublinách."},
+    "nonogram": {"name": "Nonogram", "instr": "Malovaná křížovka s čísly na okrajích."},
+    "tetromino_cipher": {"name": "Tetris šifra", "instr": "Dílky tetrisu s písmeny."},
+    "word_search_leftover": {"name": "Osmisměrka (Zbytek)", "instr": "Písmena, která zbydou po vyškrtání slov."},
+    "gauge_sorting": {"name": "Měřáky a budíky", "instr": "Seřaď stroje podle hodnot na budících."},
+    "book_indexing": {"name": "Knižní šifra", "instr": "Vezmi X-té písmeno z názvu knihy."}
+}
@@ -0,0 +1,389 @@
+# ==========================================
+# JÁDRO GENERÁTORU ÚNIKOVEK
+# Sdílí ho Streamlit editor (app.py) i dávkové CLI (batch.py).
+# ==========================================
+import asyncio
+import contextlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google import genai
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from catalog import MASTER_STYLE, PUZZLE_CATALOG
+from generators import LOCAL_GENERATORS, apply_flavor, build_flavor_prompt, generate_local_page
+from json_stream import JsonArrayStream
+from metrics import bind_context, collecting, current, incr, record, record_retry, span
+from scheduler import current as current_queue, run_queued, submit_queued
+from validators import build_repair_note, validate_page
+
+DEFAULT_MODEL = 'gemini-2.5-flash-lite'
+
+# ==========================================
+# 1. POMOCNÉ FUNKCE
+# ==========================================
+def sanitize_filename(text):
+    return re.sub(r'[^a-zA-Z0-9]', '_', text)[:50]
+
+def extract_json_array(text):
+    match = re.search(r'\[.*\]', text, re.DOTALL)
+    if match: return json.loads(match.group(0))
+    raise ValueError("JSON pole nenalezeno.")
+
+def extract_json_object(text):
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    if match: return json.loads(match.group(0))
+    raise ValueError("JSON objekt nenalezen.")
+
+def make_client(api_key, base_url=None):
+    # base_url míří např. na lokální náhradní server (fake_server.py)
+    if base_url: return genai.Client(api_key=api_key, http_options={"base_url": base_url})
+    return genai.Client(api_key=api_key)
+
+# Jeden klient na API klíč a proces. genai.Client drží pool HTTP spojení
+# a je bezpečný pro souběžné použití z víc vláken i relací.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def shared_client(api_key):
+    with _clients_lock:
+        if api_key not in _clients: _clients[api_key] = make_client(api_key)
+        return _clients[api_key]
+
+def parse_response(text, expect_array=True):
+    with span("json.extract", chars=len(text or "")):
+        if expect_array: return extract_json_array(text)
+        else: return extract_json_object(text)
+
+def generate_text(client, prompt, model_name):
+    with span("gemini.call", model=model_name, prompt_chars=len(prompt)) as s:
+        res = client.models.generate_content(model=model_name, contents=prompt)
+        s["response_chars"] = len(res.text or "")
+    return res.text
+
+def open_stream(client, prompt, model_name):
+    # HTTP požadavek odejde až při čtení prvního kusu – i ten tedy musí proběhnout ve frontě,
+    # aby 429 zachytil plánovač
+    stream = iter(client.models.generate_content_stream(model=model_name, contents=prompt))
+    first = next(stream, None)
+    return itertools.chain([] if first is None else [first], stream)
+
+def request_key(client, prompt, model_name):
+    # Stejný dotaz na stejného klienta, který už běží, plánovač pošle jen jednou.
+    # Sdílí se text odpovědi – JSON si každý volající rozparsuje sám.
+    return (id(client), model_name, prompt)
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), before_sleep=record_retry)
+def call_gemini_with_retry(client, prompt, model_name, expect_array=True):
+    text = run_queued(lambda: generate_text(client, prompt, model_name), key=request_key(client, prompt, model_name))
+    return parse_response(text, expect_array)
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), before_sleep=record_retry)
+async def call_gemini_async(client, prompt, model_name, expect_array=True, limiter=None, semaphore=None):
+    # Semafor jen na dobu dotazu – během pauzy před opakováním může jít jiná strana
+    async with semaphore or contextlib.nullcontext():
+        if limiter:
+            with span("gemini.rate_wait"): await limiter.wait()
+        if current_queue.get() is not None:
+            # S plánovačem jde dotaz přes jeho frontu a vlákna (synchronní klient)
+            text = await asyncio.wrap_future(submit_queued(
+                lambda: generate_text(client, prompt, model_name), key=request_key(client, prompt, model_name)))
+        else:
+            with span("gemini.call", model=model_name, prompt_chars=len(prompt)) as s:
+                res = await client.aio.models.generate_content(model=model_name, contents=prompt)
+                s["response_chars"] = len(res.text or "")
+            text = res.text
+    return parse_response(text, expect_array)
+
+def call_gemini_cached(client, prompt, model_name, expect_array=True, cache=None):
+    use_cache = cache is not None and cache.enabled
+    if use_cache:
+        hit = cache.get(model_name, prompt, expect_array)
+        incr("cache.hit" if hit is not None else "cache.miss")
+        if hit is not None: return hit
+    result = call_gemini_with_retry(client, prompt, model_name, expect_array)
+    if use_cache: cache.put(model_name, prompt, expect_array, result)
+    return result
+
+async def call_gemini_cached_async(client, prompt, model_name, expect_array=True, limiter=None, cache=None, semaphore=None):
+    use_cache = cache is not None and cache.enabled
+    if use_cache:
+        hit = cache.get(model_name, prompt, expect_array)
+        incr("cache.hit" if hit is not None else "cache.miss")
+        if hit is not None: return hit
+    result = await call_gemini_async(client, prompt, model_name, expect_array, limiter=limiter, semaphore=semaphore)
+    if use_cache: cache.put(model_name, prompt, expect_array, result)
+    return result
+
+class RateLimiter:
+    # Rozestupy mezi starty dotazů – nejvýš `per_second` dotazů za sekundu
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0: await asyncio.sleep(delay)
+
+# Jedna smyčka událostí na proces. Asynchronní HTTP klient Gemini je svázaný se smyčkou,
+# takže ho nesmíme sdílet mezi smyčkami z opakovaných asyncio.run().
+_loop = None
+_loop_lock = threading.Lock()
+
+def run_async(coro):
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-async", daemon=True).start()
+    # Úlohy na smyčce nedědí contextvars volajícího – aktivní sběrač měření předáme ručně
+    metrics = current.get()
+
+    async def with_metrics():
+        with collecting(metrics): return await coro
+
+    return asyncio.run_coroutine_threadsafe(with_metrics(), _loop).result()
+
+# ==========================================
+# 2. SESTAVENÍ ZADÁNÍ
+# ==========================================
+def pick_puzzle_keys(pocet_sifer, rng=random):
+    keys = list(PUZZLE_CATALOG.keys())
+    # Pokud je málo klíčů v katalogu, povolíme opakování
+    if len(keys) < pocet_sifer:
+        return [rng.choice(keys) for _ in range(pocet_sifer)]
+    return rng.sample(keys, pocet_sifer)
+
+# Části promptu, které nezávisí na tématu, se složí jednou při importu.
+# Ukázka se dělí na text před a za tématem (obsahuje JSON se složenými závorkami,
+# takže str.format nepřipadá v úvahu).
+def _compile_fragments():
+    fragments = {}
+    for key, puz in PUZZLE_CATALOG.items():
+        head = f"{puz['name']}\nPravidlo: {puz['instr']}"
+        if "ukazka" in puz:
+            tail = ("\n\n❗ INSTRUKCE: Použij strukturu JSON z ukázky, ale NAHRAĎ obsah tématem '",
+                    f"'!\nVZOR:\n{puz['ukazka']}")
+        else:
+            tail = None
+        fragments[key] = (head, tail)
+    return fragments
+
+PROMPT_FRAGMENTS = _compile_fragments()
+
+def puzzle_fragment(key, tema):
+    head, tail = PROMPT_FRAGMENTS[key]
+    return head + tail[0] + tema + tail[1] if tail else head
+
+def build_master_prompt(tema, vybrane_klicky):
+    mechanics_list_parts = [f"Strana {i+1}: {puzzle_fragment(k, tema)}" for i, k in enumerate(vybrane_klicky)]
+
+    mechanics_list = "\n\n".join(mechanics_list_parts)
+
+    return f"""
+            Téma: "{tema}". Počet stran: {len(vybrane_klicky)}.
+            SEZNAM ŠIFER:\n{mechanics_list}
+            Styl: {MASTER_STYLE}
+            Vrať POUZE validní JSON pole objektů.
+            """
+
+def build_page_prompt(tema, key, i, pocet_sifer):
+    item_text = f"Strana {i+1} z {pocet_sifer}: {puzzle_fragment(key, tema)}"
+
+    return f"""
+            Téma: "{tema}". Jedna strana únikové knihy.
+            ŠIFRA:\n{item_text}
+            Styl: {MASTER_STYLE}
+            Vrať POUZE jeden validní JSON objekt s klíči "nadpis", "zadani", "kod", "prompt".
+            """
+
+# ==========================================
+# 3. KONTROLA A OPRAVA JEDNOTLIVÝCH STRAN
+# ==========================================
+async def repair_page_async(client, tema, page, i, pocet_sifer, model_name=DEFAULT_MODEL, max_attempts=2, limiter=None, semaphore=None):
+    # Vadnou stranu generujeme znovu samostatně – stojí to jeden malý dotaz, ne celou knihu
+    errors = validate_page(page)
+    for _ in range(max_attempts):
+        if not errors: break
+        prompt = build_page_prompt(tema, page["type_key"], i, pocet_sifer) + build_repair_note(errors)
+        incr("pages.repair_attempts")
+        try:
+            # Bez cache – opravný prompt obsahuje konkrétní chyby a má dát novou odpověď
+            candidate = await call_gemini_async(client, prompt, model_name, expect_array=False, limiter=limiter, semaphore=semaphore)
+        except Exception:
+            incr("pages.repair_failures")
+            continue
+        candidate["type_key"] = page["type_key"]
+        candidate_errors = validate_page(candidate)
+        # Stejně vadný kandidát původní stranu nenahradí – oprava musí něco spravit
+        if len(candidate_errors) < len(errors): page, errors = candidate, candidate_errors
+    return page
+
+def repair_pages(client, tema, book_data, model_name=DEFAULT_MODEL, max_attempts=2):
+    failing = [i for i, page in enumerate(book_data) if validate_page(page)]
+    if not failing: return book_data
+
+    async def repair_all():
+        return await asyncio.gather(*(
+            repair_page_async(client, tema, book_data[i], i, len(book_data), model_name, max_attempts) for i in failing))
+
+    for i, page in zip(failing, run_async(repair_all())): book_data[i] = page
+    return book_data
+
+# ==========================================
+# 4. GENEROVÁNÍ KNIHY
+# ==========================================
+def split_local(vybrane_klicky, local=True):
+    # Indexy stran, které umíme postavit lokálně bez AI
+    return [i for i, k in enumerate(vybrane_klicky) if local and k in LOCAL_GENERATORS]
+
+def new_seed():
+    return random.randrange(2 ** 32)
+
+def add_flavor(client, tema, pages, model_name=DEFAULT_MODEL, cache=None):
+    # Doprovodný text je jen ozdoba – když AI selže, zůstanou výchozí nadpisy
+    try:
+        flavors = call_gemini_cached(client, build_flavor_prompt(tema, pages), model_name, expect_array=True, cache=cache)
+    except Exception:
+        return pages
+    for page, flavor in zip(pages, flavors): apply_flavor(page, flavor)
+    return pages
+
+def generate_book(client, tema, vybrane_klicky, model_name=DEFAULT_MODEL, cache=None, local=True, seed=None, max_repairs=2):
+    with span("book.generate", mode="whole", pages=len(vybrane_klicky)):
+        return _generate_book(client, tema, vybrane_klicky, model_name, cache, local, seed, max_repairs)
+
+def _generate_book(client, tema, vybrane_klicky, model_name, cache, local, seed, max_repairs):
+    if seed is None: seed = new_seed()
+    local_idx = split_local(vybrane_klicky, local)
+    ai_idx = [i for i in range(len(vybrane_klicky)) if i not in local_idx]
+    book_data = [None] * len(vybrane_klicky)
+
+    if ai_idx:
+        # Generování přes Gemini (Příběhový mód)
+        ai_keys = [vybrane_klicky[i] for i in ai_idx]
+        items = call_gemini_cached(client, build_master_prompt(tema, ai_keys), model_name, expect_array=True, cache=cache)
+        # Doplníme typy šifer pro pozdější použití
+        for i, item in zip(ai_idx, items):
+            item["type_key"] = vybrane_klicky[i]
+            book_data[i] = item
+
+    if local_idx:
+        pages = [generate_local_page(vybrane_klicky[i], tema, f"{seed}-{i}") for i in local_idx]
+        add_flavor(client, tema, pages, model_name, cache)
+        for i, page in zip(local_idx, pages): book_data[i] = page
+
+    book_data = [item for item in book_data if item is not None]
+    if max_repairs: repair_pages(client, tema, book_data, model_name, max_repairs)
+    return book_data
+
+def _stream_ai_pages(client, tema, vybrane_klicky, model_name, cache, attempts):
+    prompt = build_master_prompt(tema, vybrane_klicky)
+    use_cache = cache is not None and cache.enabled
+    if use_cache:
+        hit = cache.get(model_name, prompt, True)
+        if hit is not None:
+            for i, item in enumerate(hit):
+                item["type_key"] = vybrane_klicky[i]
+                yield item
+            return
+
+    for attempt in range(attempts):
+        parser = JsonArrayStream()
+        items = []
+        start = time.perf_counter()
+        response_chars = 0
+        try:
+            # Stream se nedá sdílet, takže ho plánovač neslučuje – jen ho pustí, až přijde na řadu
+            for chunk in run_queued(lambda: open_stream(client, prompt, model_name)):
+                response_chars += len(chunk.text or "")
+                for item in parser.feed(chunk.text or ""):
+                    if len(items) == len(vybrane_klicky): raise ValueError(f"Model vrátil víc stran, než bylo zadáno ({len(vybrane_klicky)}).")
+                    items.append(dict(item))
+                    item["type_key"] = vybrane_klicky[len(items) - 1]
+                    if len(items) == 1: record("gemini.first_page", time.perf_counter() - start, model=model_name)
+                    yield item
+            if not parser.started: raise ValueError("JSON pole nenalezeno.")
+            # Useknutá odpověď (limit výstupu) nebo '[' mimo pole skončí bez chyby parseru –
+            # neúplnou knihu nesmíme vydávat za hotovou ani uložit do cache
+            if not parser.closed: raise ValueError(f"Odpověď skončila uprostřed JSON pole (stran: {len(items)} z {len(vybrane_klicky)}).")
+            if len(items) != len(vybrane_klicky): raise ValueError(f"Model vrátil {len(items)} stran z {len(vybrane_klicky)}.")
+            record("gemini.stream", time.perf_counter() - start, model=model_name,
+                   prompt_chars=len(prompt), response_chars=response_chars, pages=len(items))
+            break
+        except Exception:
+            # Po první odeslané straně už opakovat nejde – editor ji má rozpracovanou
+            if items or attempt == attempts - 1: raise
+            incr("gemini.retries")
+            record("gemini.backoff", min(2 ** (attempt + 1), 10), attempt=attempt + 1)
+            time.sleep(min(2 ** (attempt + 1), 10))
+
+    if use_cache: cache.put(model_name, prompt, True, items)
+
+def stream_book(client, tema, vybrane_klicky, model_name=DEFAULT_MODEL, cache=None, attempts=3, local=True, seed=None, max_repairs=2):
+    # Stejný prompt jako generate_book, ale strany se vrací postupně, jak je Gemini dopíše
+    if seed is None: seed = new_seed()
+    local_pages = {i: generate_local_page(vybrane_klicky[i], tema, f"{seed}-{i}") for i in split_local(vybrane_klicky, local)}
+    ai_keys = [k for i, k in enumerate(vybrane_klicky) if i not in local_pages]
+    ai_items = _stream_ai_pages(client, tema, ai_keys, model_name, cache, attempts) if ai_keys else iter(())
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        # Doprovodný text lokálních stran běží vedle streamu
+        flavored = pool.submit(bind_context(add_flavor), client, tema, list(local_pages.values()), model_name, cache) if local_pages else None
+        for i in range(len(vybrane_klicky)):
+            if i in local_pages:
+                flavored.result()
+                yield local_pages[i]
+            else:
+                item = next(ai_items, None)
+                if item is None: continue
+                if max_repairs and validate_page(item):
+                    item = run_async(repair_page_async(client, tema, item, i, len(vybrane_klicky), model_name, max_repairs))
+                yield item
+        # Dočerpat stream, ať se odpověď uloží do cache a zapíše se měření
+        for _ in ai_items: pass
+
+async def generate_book_per_page_async(client, tema, vybrane_klicky, model_name=DEFAULT_MODEL, concurrency=4, rate_per_sec=None, cache=None, local=True, seed=None, max_repairs=2):
+    # Každá strana je samostatný dotaz – selhání opakuje jen tu jednu stranu
+    if seed is None: seed = new_seed()
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate_per_sec) if rate_per_sec else None
+    local_idx = set(split_local(vybrane_klicky, local))
+
+    async def one_local_page(i, key):
+        page = generate_local_page(key, tema, f"{seed}-{i}")
+        try:
+            flavors = await call_gemini_cached_async(client, build_flavor_prompt(tema, [page]), model_name, expect_array=True,
+                                                     limiter=limiter, cache=cache, semaphore=semaphore)
+            if flavors: apply_flavor(page, flavors[0])
+        except Exception:
+            pass # Bez doprovodného textu se obejdeme
+        return page
+
+    async def one_page(i, key):
+        if i in local_idx: return await one_local_page(i, key)
+        # Semafor bere až samotný dotaz (call_gemini_async), ne celé opakování i s pauzami
+        prompt = build_page_prompt(tema, key, i, len(vybrane_klicky))
+        item = await call_gemini_cached_async(client, prompt, model_name, expect_array=False, limiter=limiter, cache=cache, semaphore=semaphore)
+        item["type_key"] = key
+        if max_repairs and validate_page(item):
+            item = await repair_page_async(client, tema, item, i, len(vybrane_klicky), model_name, max_repairs, limiter, semaphore)
+        return item
+
+    # gather vrací výsledky v pořadí stran, ne v pořadí dokončení
+    return await asyncio.gather(*(one_page(i, k) for i, k in enumerate(vybrane_klicky)))
+
+def generate_book_per_page(client, tema, vybrane_klicky, model_name=DEFAULT_MODEL, concurrency=4, rate_per_sec=None, cache=None, local=True, seed=None, max_repairs=2):
+    with span("book.generate", mode="per_page", pages=len(vybrane_klicky)):
+        return list(run_async(generate_book_per_page_async(
+            client, tema, vybrane_klicky, model_name, concurrency=concurrency, rate_per_sec=rate_per_sec,
+            cache=cache, local=local, seed=seed, max_repairs=max_repairs)))
@@ -0,0 +1,138 @@
+# ==========================================
+# FALEŠNÝ GEMINI KLIENT PRO OFFLINE BĚH
+# Napodobuje rozhraní genai.Client (models.generate_content a
+# aio.models.generate_content) a vrací deterministický JSON podle promptu.
+# Hodí se pro zkoušení cache, dávek a měření bez API klíče.
+# S quota=N odmítne víc než N dotazů za sekundu chybou 429 jako skutečné API.
+# FakeImageBackend stejně tak zastoupí obrázkový model (viz image_gen.py).
+# ==========================================
+import asyncio
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from collections import Counter
+
+from scheduler import TokenBucket
+
+class FakeRateLimitError(Exception):
+    # Stejné atributy jako genai.errors.ClientError pro HTTP 429
+    code = 429
+    status = "RESOURCE_EXHAUSTED"
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+def fake_page(prompt, i=0):
+    digest = hashlib.sha256(f"{prompt}|{i}".encode("utf-8")).hexdigest()
+    kod = str(int(digest[:8], 16))[:4].rjust(4, "0")
+    return {
+        "nadpis": f"Strana {i+1}",
+        "zadani": f"Vyřeš šifru a získej kód ({digest[:6]}).",
+        "kod": kod,
+        "prompt": f"Cheerful vector illustration, puzzle page {i+1}.",
+    }
+
+def fake_text(prompt):
+    # Velký prompt celé knihy obsahuje "Počet stran: N" a čeká JSON pole,
+    # doprovodný text lokálních šifer chce pole po stranách, prompt jedné strany jeden objekt.
+    match = re.search(r"Počet stran: (\d+)", prompt)
+    if match or "JSON pole" in prompt:
+        count = int(match.group(1)) if match else max(1, len(re.findall(r"Strana \d+:", prompt)))
+        body = json.dumps([fake_page(prompt, i) for i in range(count)], ensure_ascii=False)
+    else:
+        body = json.dumps(fake_page(prompt), ensure_ascii=False)
+    return f"```json\n{body}\n```"
+
+class _FakeModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents):
+        self.owner._record(model, contents)
+        if self.owner.latency: time.sleep(self.owner.latency)
+        return FakeResponse(self.owner.responder(contents))
+
+    def generate_content_stream(self, model, contents):
+        self.owner._record(model, contents)
+        text = self.owner.responder(contents)
+        step = self.owner.chunk_size
+        for i in range(0, len(text), step):
+            if self.owner.latency: time.sleep(self.owner.latency / max(1, len(text) // step))
+            yield FakeResponse(text[i:i + step])
+
+class _FakeAsyncModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def generate_content(self, model, contents):
+        self.owner._record(model, contents)
+        if self.owner.latency: await asyncio.sleep(self.owner.latency)
+        return FakeResponse(self.owner.responder(contents))
+
+class _FakeAio:
+    def __init__(self, owner):
+        self.models = _FakeAsyncModels(owner)
+
+class FakeClient:
+    def __init__(self, latency=0.0, responder=fake_text, chunk_size=64, quota=None):
+        self.latency = latency
+        self.quota = TokenBucket(quota) if quota else None
+        self.rejected = 0
+        self.chunk_size = chunk_size
+        self.responder = responder
+        self.calls = []
+        self.lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+
+    def _record(self, model, contents):
+        with self.lock:
+            if self.quota and self.quota.take(time.monotonic()) > 0:
+                self.rejected += 1
+                raise FakeRateLimitError("Resource has been exhausted (e.g. check quota).")
+            self.calls.append((model, contents))
+
+    @property
+    def call_count(self):
+        return len(self.calls)
+
+def fake_image(prompt, size=(1024, 768)):
+    # Deterministický obrázek podle hashe promptu – barevné pozadí a pár tvarů
+    from PIL import Image, ImageDraw
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    img = Image.new("RGB", size, tuple(128 + b // 2 for b in digest[:3]))
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for n in range(3, 27, 4):
+        x, y = digest[n] * w // 256, digest[n + 1] * h // 256
+        r = 40 + digest[n + 2] % 120
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(digest[n:n + 3]), outline=(0, 0, 0), width=4)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+class FakeImageBackend:
+    # fail_first=N: každý prompt prvních N pokusů selže s 429 (vyzkouší opakování po stranách)
+    def __init__(self, latency=0.0, fail_first=0, size=(1024, 768)):
+        self.model = "fake-image"
+        self.latency = latency
+        self.fail_first = fail_first
+        self.size = size
+        self.attempts = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def call_count(self):
+        return sum(self.attempts.values())
+
+    async def generate(self, prompt):
+        with self.lock:
+            self.attempts[prompt] += 1
+            attempt = self.attempts[prompt]
+        if self.latency: await asyncio.sleep(self.latency)
+        if attempt <= self.fail_first: raise FakeRateLimitError("Resource has been exhausted (e.g. check quota).")
+        return await asyncio.to_thread(fake_image, prompt, self.size)
@@ -0,0 +1,120 @@
+# ==========================================
+# LOKÁLNÍ NÁHRADA GEMINI API (HTTP)
+# Odpovídá na generateContent a streamGenerateContent stejně jako Gemini API,
+# obsah bere z fake_text. Nad kvótu (--quota dotazů za sekundu) vrací 429
+# RESOURCE_EXHAUSTED, takže se na ní dá vyzkoušet plánovač i s opravdovým
+# genai klientem – bez API klíče a bez sítě:
+#
+#   python fake_server.py --port 8765 --quota 2
+#   python batch.py --base-url http://127.0.0.1:8765 --queue-rate 1.5 --tema Piráti --tema Vesmír
+# ==========================================
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_gemini import fake_text
+from scheduler import TokenBucket
+
+PATH_RE = re.compile(r"/v1\w*/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)")
+
+def response_json(text):
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, quota=None, latency=0.0, chunk_size=64, responder=fake_text):
+        super().__init__(address, FakeGeminiHandler)
+        self.bucket = TokenBucket(quota) if quota else None
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.responder = responder
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def admit(self):
+        with self.lock:
+            if self.bucket and self.bucket.take(time.monotonic()) > 0:
+                self.rejected += 1
+                return False
+            self.served += 1
+            return True
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass # Bez výpisu každého dotazu
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        match = PATH_RE.match(self.path)
+        if not match:
+            return self.send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+        if not self.server.admit():
+            return self.send_json(429, {"error": {
+                "code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}})
+
+        request = json.loads(body or b"{}")
+        prompt = "".join(part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", []))
+        text = self.server.responder(prompt)
+        if self.server.latency: time.sleep(self.server.latency)
+
+        if match.group("method") == "generateContent":
+            return self.send_json(200, response_json(text))
+
+        # Stream jako server-sent events, jeden kus textu na událost
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        step = self.server.chunk_size
+        for i in range(0, len(text), step):
+            event = json.dumps(response_json(text[i:i + step]), ensure_ascii=False)
+            self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+def start_server(host="127.0.0.1", port=0, **kwargs):
+    # Server na pozadí – port 0 = vybere se volný, adresu vrátí server.base_url
+    server = FakeGeminiServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lokální náhrada Gemini API, která simuluje 429.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quota", type=float, help="Dotazů za sekundu, nad které vrací 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="Umělé zpoždění odpovědi v sekundách")
+    args = parser.parse_args(argv)
+
+    server = FakeGeminiServer((args.host, args.port), quota=args.quota, latency=args.latency)
+    print(f"Falešné Gemini API na {server.base_url} (kvóta: {args.quota or 'bez limitu'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Obslouženo: {server.served}, odmítnuto 429: {server.rejected}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
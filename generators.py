@@ -0,0 +1,327 @@
+# ==========================================
+# LOKÁLNÍ GENERÁTORY ALGORITMICKÝCH ŠIFER
+# Šifry, které jsou čistě mechanické (posun abecedy, Morseovka, bludiště...),
+# nemá smysl nechávat vymýšlet Gemini – často vrátí kód, který k zadání nesedí.
+# Tady je postavíme v Pythonu z tématu a seedu a kód spočítáme přesně.
+# Od AI pak chceme jen nadpis, krátký úvod a prompt na ilustraci.
+# ==========================================
+import random
+import unicodedata
+
+from catalog import PUZZLE_CATALOG
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# Slova bez diakritiky, ať se dají šifrovat anglickou abecedou
+WORDS = [
+    "LOD", "LES", "SYR", "KOS", "MEC", "OKO", "DUB", "SUD", "NOS", "PES", "RAK", "LEV", "HAD",
+    "MAPA", "HRAD", "DRAK", "RYBA", "KOZA", "LAMA", "MOST", "VLNA", "PERO", "NOTA", "SOVA",
+    "KOST", "LUNA", "KAPR", "TYGR", "KOLO", "MRAK", "DORT", "MORE", "VILA", "ROSA",
+    "KOTVA", "ZAMEK", "LOUKA", "KOCKA", "LAMPA", "BARVA", "KOULE", "HOUBA", "OPICE", "SKALA",
+    "LISKA", "PIRAT", "TRUBKA", "HVEZDA", "TRUHLA", "POKLAD", "RAKETA", "OSTROV", "KOMPAS",
+    "VLAJKA", "ZIRAFA", "DELFIN", "JEZERO", "PLACHTA", "VEVERKA",
+]
+
+MORSE = {
+    "A": ".-", "B": "-...", "C": "-.-.", "D": "-..", "E": ".", "F": "..-.", "G": "--.",
+    "H": "....", "I": "..", "J": ".---", "K": "-.-", "L": ".-..", "M": "--", "N": "-.",
+    "O": "---", "P": ".--.", "Q": "--.-", "R": ".-.", "S": "...", "T": "-", "U": "..-",
+    "V": "...-", "W": ".--", "X": "-..-", "Y": "-.--", "Z": "--..",
+}
+
+# Číslice 3×5 pro nonogram a kreslení souřadnic
+DIGITS = {
+    "0": ["111", "101", "101", "101", "111"],
+    "1": ["010", "110", "010", "010", "111"],
+    "2": ["111", "001", "111", "100", "111"],
+    "3": ["111", "001", "111", "001", "111"],
+    "4": ["101", "101", "111", "001", "001"],
+    "5": ["111", "100", "111", "001", "111"],
+    "6": ["111", "100", "111", "101", "111"],
+    "7": ["111", "001", "001", "001", "001"],
+    "8": ["111", "101", "111", "101", "111"],
+    "9": ["111", "101", "111", "001", "111"],
+}
+
+def theme_word(tema):
+    # "Piráti" -> "PIRATI"; slouží jako tématické tajné slovo, pokud má rozumnou délku
+    plain = unicodedata.normalize("NFKD", tema).encode("ascii", "ignore").decode("ascii")
+    word = "".join(ch for ch in plain.upper() if ch in ALPHABET)
+    return word if 3 <= len(word) <= 7 else None
+
+def pick_word(rng, tema, min_len=3, max_len=7):
+    pool = [w for w in WORDS if min_len <= len(w) <= max_len]
+    themed = theme_word(tema)
+    if themed and min_len <= len(themed) <= max_len and rng.random() < 0.5: return themed
+    return rng.choice(pool)
+
+def markdown_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(row) + " |" for row in rows]
+    return "\n".join(lines)
+
+def digit_bitmap(code):
+    # Dvě číslice vedle sebe s mezerou -> mřížka 5×7
+    return ["0".join(DIGITS[d][r] for d in code) for r in range(5)]
+
+def line_clue(cells):
+    runs, run = [], 0
+    for c in cells + "0":
+        if c == "1": run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    return runs or [0]
+
+# ==========================================
+# JEDNOTLIVÉ GENERÁTORY – vrací (text zadání, kód)
+# ==========================================
+def gen_caesar(rng, tema):
+    word = pick_word(rng, tema, 4, 6)
+    shift = rng.randint(1, 5)
+    cipher = "".join(ALPHABET[(ALPHABET.index(ch) + shift) % 26] for ch in word)
+    zadani = (
+        f"Každé písmeno tajného slova je v abecedě posunuté o {shift} dopředu. "
+        f"Posuň ho zpátky a přečti kód.\n{ALPHABET}\n**{cipher}**"
+    )
+    return zadani, word
+
+def gen_morse(rng, tema):
+    word = pick_word(rng, tema, 3, 5)
+    zvuk = lambda ch: " ".join("píp" if s == "." else "túúú" for s in MORSE[ch])
+    zprava = " / ".join(zvuk(ch) for ch in word)
+    # Legenda s písmeny ze slova a pár návnadami
+    letters = sorted(set(word) | set(rng.sample([c for c in ALPHABET if c not in word], 3)))
+    legend = markdown_table(["Písmeno", "Morse"], [[ch, MORSE[ch].replace(".", "•").replace("-", "—")] for ch in letters])
+    zadani = (
+        "Zvířata volají Morseovkou: krátké 'píp' je tečka, dlouhé 'túúú' je čárka, lomítko dělí písmena.\n"
+        f"{zprava}\n{legend}"
+    )
+    return zadani, word
+
+def gen_mirror_writing(rng, tema):
+    word = pick_word(rng, tema, 4, 7)
+    return f"Tajné slovo je napsané zrcadlově pozpátku. Přečti ho správně:\n**{word[::-1]}**", word
+
+def gen_diagonal_acrostic(rng, tema):
+    secrets = [w for w in WORDS if len(w) == 4]
+    rng.shuffle(secrets)
+    for secret in secrets:
+        chosen = []
+        for i, ch in enumerate(secret):
+            candidates = [w for w in WORDS if len(w) > i and w[i] == ch and w != secret and w not in chosen]
+            if not candidates: break
+            chosen.append(rng.choice(candidates))
+        else:
+            width = max(len(w) for w in chosen)
+            rows = [list(w) + [""] * (width - len(w)) for w in chosen]
+            zadani = "Přečti písmena šikmo: 1. písmeno 1. slova, 2. písmeno 2. slova a tak dál."
+            return zadani + "\n" + markdown_table([str(n + 1) for n in range(width)], rows), secret
+    raise ValueError("Nepodařilo se sestavit diagonální čtení.")
+
+def _nonogram_solutions(row_clues, col_clues, width, limit=2):
+    # Počet řešení (nejvýš `limit`) – ověřujeme, že nonogram má jediné řešení
+    options = []
+    for clue in row_clues:
+        opts = [f"{n:0{width}b}" for n in range(2 ** width)]
+        options.append([o for o in opts if line_clue(o) == clue])
+    found = []
+
+    def search(r, rows):
+        if len(found) >= limit: return
+        if r == len(options):
+            if all(line_clue("".join(row[c] for row in rows)) == col_clues[c] for c in range(width)):
+                found.append(list(rows))
+            return
+        for o in options[r]:
+            search(r + 1, rows + [o])
+
+    search(0, [])
+    return len(found)
+
+def gen_nonogram(rng, tema):
+    pairs = [f"{a}{b}" for a in DIGITS for b in DIGITS]
+    rng.shuffle(pairs)
+    for code in pairs:
+        grid = digit_bitmap(code)
+        row_clues = [line_clue(r) for r in grid]
+        col_clues = [line_clue("".join(r[c] for r in grid)) for c in range(7)]
+        if _nonogram_solutions(row_clues, col_clues, 7) == 1: break
+    header = [""] + [" ".join(map(str, c)) for c in col_clues]
+    rows = [[" ".join(map(str, c))] + [""] * 7 for c in row_clues]
+    zadani = "Vybarvi políčka podle čísel u řádků a sloupců. Obrázek ukáže dvě číslice kódu."
+    return zadani + "\n" + markdown_table(header, rows), code
+
+def gen_classic_maze(rng, tema, w=5, h=4):
+    # Dokonalé bludiště (DFS) – mezi startem a cílem vede právě jedna cesta
+    grid = [["█"] * (2 * w + 1) for _ in range(2 * h + 1)]
+    stack, seen = [(0, 0)], {(0, 0)}
+    grid[1][1] = ""
+    while stack:
+        x, y = stack[-1]
+        nbrs = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                if 0 <= x + dx < w and 0 <= y + dy < h and (x + dx, y + dy) not in seen]
+        if not nbrs:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(nbrs)
+        grid[y + ny + 1][x + nx + 1] = ""
+        grid[2 * ny + 1][2 * nx + 1] = ""
+        seen.add((nx, ny))
+        stack.append((nx, ny))
+
+    # Cesta ze startu (vlevo nahoře) do cíle (vpravo dole)
+    start, goal = (1, 1), (2 * w - 1, 2 * h - 1)
+    prev, queue = {start: None}, [start]
+    for cx, cy in queue:
+        for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+            if grid[ny][nx] == "" and (nx, ny) not in prev:
+                prev[(nx, ny)] = (cx, cy)
+                queue.append((nx, ny))
+    path, node = [], goal
+    while node:
+        path.append(node)
+        node = prev[node]
+    path.reverse()
+
+    # Číslice na cestě tvoří kód, další číslice mimo cestu jsou návnady
+    on_path = [p for p in path[1:-1] if p[0] % 2 and p[1] % 2]
+    code_cells = sorted(rng.sample(on_path, min(3, len(on_path))), key=path.index)
+    off_path = [(x, y) for y in range(1, 2 * h, 2) for x in range(1, 2 * w, 2) if (x, y) not in path]
+    decoys = rng.sample(off_path, min(3, len(off_path)))
+    code = ""
+    for x, y in code_cells:
+        d = str(rng.randint(1, 9))
+        grid[y][x] = d
+        code += d
+    for x, y in decoys:
+        grid[y][x] = str(rng.randint(1, 9))
+    grid[start[1]][start[0]] = "S"
+    grid[goal[1]][goal[0]] = "C"
+
+    zadani = "Projdi bludištěm ze startu S do cíle C. Číslice, které cestou sebereš, tvoří kód."
+    return zadani + "\n" + markdown_table(grid[0], grid[1:]), code
+
+WORD_SEARCH_DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1), (-1, 0), (0, -1), (-1, -1), (-1, 1)]
+
+def word_cells(grid, word):
+    # Všechna políčka, kudy se dá slovo v osmisměrce přečíst (všemi výskyty)
+    size = len(grid)
+    found = set()
+    for dx, dy in WORD_SEARCH_DIRECTIONS:
+        for y in range(size):
+            for x in range(size):
+                cells = [(x + dx * k, y + dy * k) for k in range(len(word))]
+                if all(0 <= cx < size and 0 <= cy < size and grid[cy][cx] == word[k]
+                       for k, (cx, cy) in enumerate(cells)):
+                    found.update(cells)
+    return found
+
+def gen_word_search_leftover(rng, tema, size=6):
+    directions = WORD_SEARCH_DIRECTIONS
+    secrets = {len(w): w for w in sorted(WORDS, key=lambda _: rng.random())}
+    for _ in range(500):
+        grid = [[""] * size for _ in range(size)]
+        placed = []
+        for word in sorted(WORDS, key=lambda _: rng.random()):
+            if len(word) > size: continue
+            spots = []
+            for dx, dy in directions:
+                for y in range(size):
+                    for x in range(size):
+                        cells = [(x + dx * k, y + dy * k) for k in range(len(word))]
+                        if all(0 <= cx < size and 0 <= cy < size and grid[cy][cx] in ("", word[k])
+                               for k, (cx, cy) in enumerate(cells)):
+                            spots.append(cells)
+            if not spots: continue
+            for k, (cx, cy) in enumerate(rng.choice(spots)):
+                grid[cy][cx] = word[k]
+            placed.append(word)
+            empty = sum(row.count("") for row in grid)
+            if empty <= 7 and empty in secrets and secrets[empty] not in placed: break
+        empty = sum(row.count("") for row in grid)
+        secret = secrets.get(empty)
+        if secret and secret not in placed:
+            used = {(x, y) for y in range(size) for x in range(size) if grid[y][x]}
+            letters = iter(secret)
+            grid = [[cell or next(letters) for cell in row] for row in grid]
+            # Slovo se nesmí dát přečíst i podruhé přes zbylá písmena – řešitel by je vyškrtal
+            if set().union(*(word_cells(grid, w) for w in placed)) != used: continue
+            zadani = (
+                f"Vyškrtej slova: {', '.join(sorted(placed))}. "
+                "Písmena, která zbydou, přečti po řádcích zleva doprava."
+            )
+            return zadani + "\n" + markdown_table([str(n + 1) for n in range(size)], grid), secret
+    raise ValueError("Nepodařilo se sestavit osmisměrku.")
+
+def gen_coordinate_drawing(rng, tema):
+    code = f"{rng.randint(0, 9)}{rng.randint(0, 9)}"
+    grid = digit_bitmap(code)
+    cols = "ABCDEFG"
+    coords = [f"{cols[c]}{r + 1}" for r in range(5) for c in range(7) if grid[r][c] == "1"]
+    rng.shuffle(coords)
+    zadani = f"Vybarvi políčka: {', '.join(coords)}. Objeví se dvě číslice kódu."
+    rows = [[str(r + 1)] + [""] * 7 for r in range(5)]
+    return zadani + "\n" + markdown_table([""] + list(cols), rows), code
+
+def gen_matrix_indexing(rng, tema, size=4):
+    word = pick_word(rng, tema, 4, 6)
+    cells = rng.sample([(r, c) for r in range(size) for c in range(size)], len(word))
+    letters = [[rng.choice(ALPHABET) for _ in range(size)] for _ in range(size)]
+    numbers = [[""] * size for _ in range(size)]
+    for n, ((r, c), ch) in enumerate(zip(cells, word)):
+        letters[r][c] = ch
+        numbers[r][c] = str(n + 1)
+    cols = "ABCD"[:size]
+    header = [""] + list(cols) + [""] + list(cols)
+    rows = [[str(r + 1)] + letters[r] + [str(r + 1)] + numbers[r] for r in range(size)]
+    zadani = (
+        f"V pravé mřížce najdi čísla 1 až {len(word)}. "
+        "Písmeno na stejném místě v levé mřížce je další písmeno kódu."
+    )
+    return zadani + "\n" + markdown_table(header, rows), word
+
+LOCAL_GENERATORS = {
+    "caesar": gen_caesar,
+    "morse": gen_morse,
+    "mirror_writing": gen_mirror_writing,
+    "diagonal_acrostic": gen_diagonal_acrostic,
+    "nonogram": gen_nonogram,
+    "classic_maze": gen_classic_maze,
+    "word_search_leftover": gen_word_search_leftover,
+    "coordinate_drawing": gen_coordinate_drawing,
+    "matrix_indexing": gen_matrix_indexing,
+}
+
+# ==========================================
+# SESTAVENÍ STRANY
+# ==========================================
+def generate_local_page(key, tema, seed):
+    # Stejné téma + seed = stejná šifra
+    rng = random.Random(f"{tema}|{key}|{seed}")
+    zadani, kod = LOCAL_GENERATORS[key](rng, tema)
+    return {
+        "nadpis": PUZZLE_CATALOG[key]["name"],
+        "zadani": zadani,
+        "kod": kod,
+        "prompt": f"Decorative scene for the theme '{tema}'. No letters, no numbers, no text.",
+        "type_key": key,
+        "seed": seed,
+    }
+
+def build_flavor_prompt(tema, pages):
+    popisy = "\n".join(f"Strana {i+1}: {PUZZLE_CATALOG[p['type_key']]['name']}" for i, p in enumerate(pages))
+    return f"""
+            Téma: "{tema}". Šifry už jsou hotové, potřebujeme k nim jen doprovodný text.
+            {popisy}
+            Pro každou stranu vrať objekt s klíči "nadpis" (krátký a tématický),
+            "uvod" (1-2 věty příběhu, NEPROZRAZUJ řešení ani kód) a
+            "prompt" (anglický popis dekorativní ilustrace BEZ písmen a číslic).
+            Vrať POUZE validní JSON pole objektů ve stejném pořadí.
+            """
+
+def apply_flavor(page, flavor):
+    page["nadpis"] = flavor.get("nadpis") or page["nadpis"]
+    if flavor.get("uvod"): page["zadani"] = f"{flavor['uvod']}\n{page['zadani']}"
+    page["prompt"] = flavor.get("prompt") or page["prompt"]
+    return page
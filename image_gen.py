@@ -0,0 +1,128 @@
+# ==========================================
+# OBRÁZKY Z PROMPTŮ STRAN
+# Prompt každé strany (s MASTER_STYLE na začátku) se pošle obrázkovému
+# modelu, souběžně a s omezeným počtem dotazů naráz. Každá strana se opakuje
+# samostatně, chyba jedné strany ostatní nezastaví. Výsledky se ukládají na
+# disk podle hashe modelu a promptu i s náhledem do editoru, takže stejný
+# prompt se podruhé negeneruje. Hotový obrázek jde do 'uploaded_image' jako
+# SpilledImage – sazba ho čte stejně jako nahraný soubor. Složka má stejný
+# strop a stáří jako spill nahraných obrázků (images.evict_lru).
+# Vlastní nahraný obrázek má přednost a nepřepisuje se.
+# ==========================================
+import asyncio
+import hashlib
+import os
+import threading
+
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from catalog import MASTER_STYLE
+from engine import run_async
+from images import SPILL_MAX_AGE, SpilledImage, evict_lru, make_thumbnail, touch, write_atomic
+from metrics import incr, record_retry, span
+
+DEFAULT_IMAGE_MODEL = 'imagen-4.0-generate-001'
+IMAGE_CACHE_DIR = os.environ.get("UNIKOVKY_IMAGE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "generated")
+IMAGE_CACHE_MAX_BYTES = 1024 ** 3       # vygenerované obrázky i s náhledy
+
+def build_image_prompt(prompt):
+    return f"{MASTER_STYLE}\n{prompt}"
+
+class GeminiImageBackend:
+    def __init__(self, client, model=DEFAULT_IMAGE_MODEL):
+        self.client = client
+        self.model = model
+
+    async def generate(self, prompt):
+        res = await self.client.aio.models.generate_images(model=self.model, prompt=prompt, config={"number_of_images": 1})
+        # Bezpečnostní filtr může vrátit prázdný výsledek bez chyby
+        if not res.generated_images: raise ValueError("Model nevrátil žádný obrázek.")
+        return res.generated_images[0].image.image_bytes
+
+class GeneratedImageStore:
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES, max_age=SPILL_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, model, prompt):
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".img", base + ".thumb.jpg"
+
+    def _entry(self, path, thumb_path, data):
+        # Digest z obsahu, ne z klíče – přegenerovaný obrázek má stejný klíč, ale jinou stranu v PDF
+        return SpilledImage(path, hashlib.sha256(data).hexdigest(), len(data)), thumb_path
+
+    def get(self, key):
+        path, thumb_path = self._paths(key)
+        if not (os.path.exists(path) and os.path.exists(thumb_path)): return None
+        try:
+            with open(path, "rb") as f: data = f.read()
+        except FileNotFoundError:
+            return None  # mezitím smazal evict
+        # Zásah cache = použití, mtime chrání obrázek i náhled před evict
+        touch(path)
+        touch(thumb_path)
+        return self._entry(path, thumb_path, data)
+
+    def put(self, key, data):
+        path, thumb_path = self._paths(key)
+        write_atomic(path, data)
+        write_atomic(thumb_path, make_thumbnail(data))
+        with self.lock: evict_lru(self.directory, self.max_bytes, self.max_age, {path, thumb_path})
+        return self._entry(path, thumb_path, data)
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10), before_sleep=record_retry)
+async def generate_image_with_retry(backend, prompt, semaphore):
+    # Semafor jen na dobu dotazu – během pauzy před opakováním může jít jiná strana
+    async with semaphore:
+        with span("image.generate", model=backend.model, prompt_chars=len(prompt)) as s:
+            data = await backend.generate(prompt)
+            s["bytes"] = len(data)
+    return data
+
+async def generate_images_async(backend, book_data, store, concurrency=4, force=False, on_done=None):
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = {}
+
+    async def fetch(key, prompt):
+        entry = None if force else await asyncio.to_thread(store.get, key)
+        incr("images.cache.hit" if entry else "images.cache.miss")
+        if entry is not None: return entry, "z cache"
+        data = await generate_image_with_retry(backend, prompt, semaphore)
+        # Zápis a náhled přes PIL mimo smyčku událostí
+        return await asyncio.to_thread(store.put, key, data), "vygenerováno"
+
+    async def one_page(i, page):
+        if page.get('uploaded_image') and page.get('image_source') != "ai": return {"strana": i + 1, "stav": "vlastní obrázek"}
+        if not page.get('prompt'): return {"strana": i + 1, "stav": "bez promptu"}
+
+        prompt = build_image_prompt(page['prompt'])
+        key = store.key(backend.model, prompt)
+        # Stejný prompt na víc stranách se generuje jen jednou
+        if key not in pending: pending[key] = asyncio.ensure_future(fetch(key, prompt))
+        try:
+            entry, stav = await pending[key]
+        except Exception as e:
+            return {"strana": i + 1, "stav": "chyba", "chyba": str(e)}
+        page['uploaded_image'], page['image_thumb'] = entry
+        page['image_source'] = "ai"
+        return {"strana": i + 1, "stav": stav}
+
+    async def tracked(i, page):
+        result = await one_page(i, page)
+        if on_done: on_done(result)
+        return result
+
+    # gather vrací výsledky v pořadí stran, ne v pořadí dokončení
+    return await asyncio.gather(*(tracked(i, page) for i, page in enumerate(book_data)))
+
+def generate_images(backend, book_data, store=None, concurrency=4, force=False, on_done=None):
+    store = store or GeneratedImageStore()
+    with span("images.generate", pages=len(book_data), concurrency=concurrency):
+        return list(run_async(generate_images_async(backend, book_data, store, concurrency, force, on_done)))
@@ -0,0 +1,206 @@
+# ==========================================
+# PŘÍPRAVA OBRÁZKŮ PŘED VLOŽENÍM DO PDF
+# Fotky z mobilu a AI rendery mají klidně 4000 px a megabajty metadat.
+# Do slotu 160 mm stačí rozlišení pro tiskové DPI, takže obrázek zmenšíme,
+# zvolíme vhodný formát (PNG pro plochou grafiku, JPEG pro fotky) a zahodíme
+# EXIF/ICC. Výsledek se drží v paměti podle hashe obsahu, takže opakovaná
+# sazba po opravě textu už obrázky znovu nepřepočítává.
+# ==========================================
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageOps
+
+from metrics import record
+
+SLOT_WIDTH_MM = 160
+PRINT_DPI = 300
+JPEG_QUALITY = 85
+FLAT_COLORS = 256   # plochá vektorová grafika má málo barev -> PNG
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+THUMB_PX = 256      # náhled v editoru
+SPILL_DIR = os.environ.get("UNIKOVKY_SPILL_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "images")
+SPILL_MAX_BYTES = 2 * 1024 ** 3         # strop spill složky, nad ním se mažou nejdéle nepoužité
+SPILL_MAX_AGE = 7 * 24 * 3600           # soubor nepoužitý týden se smaže i pod stropem
+
+class PreparedImage:
+    def __init__(self, data, fmt, orig_bytes, seconds):
+        self.data = data
+        self.fmt = fmt
+        self.orig_bytes = orig_bytes
+        self.seconds = seconds
+
+class ImageCache:
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None: self.entries.move_to_end(key)
+            return item
+
+    def put(self, key, item):
+        with self.lock:
+            if key in self.entries: self.total_bytes -= len(self.entries.pop(key).data)
+            self.entries[key] = item
+            self.total_bytes += len(item.data)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.total_bytes -= len(old.data)
+
+image_cache = ImageCache()
+
+def target_width_px(dpi=PRINT_DPI):
+    return round(SLOT_WIDTH_MM / 25.4 * dpi)
+
+def _flatten(img):
+    # PDF stránka je bílá – průhlednost rovnou slijeme s bílým pozadím
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment")
+
+def _has_metadata(img):
+    # EXIF (včetně GPS a orientace), barevný profil nebo XMP – originál by je nesl do PDF
+    return bool(img.getexif()) or any(img.info.get(k) for k in METADATA_KEYS)
+
+def _process(data, dpi):
+    img = Image.open(io.BytesIO(data))
+    has_metadata = _has_metadata(img)
+    # Otočení podle EXIF musíme aplikovat dřív, než metadata zahodíme
+    img = _flatten(ImageOps.exif_transpose(img))
+    # convert/quantize kopírují img.info a PNG/JPEG zápis si z něj vezme ICC profil – pryč s ním
+    img.info.clear()
+
+    width = target_width_px(dpi)
+    if img.width > width:
+        img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+
+    out = io.BytesIO()
+    if img.getcolors(FLAT_COLORS) is not None:
+        img.quantize(FLAT_COLORS).save(out, format="PNG", optimize=True)
+        fmt = "PNG"
+    else:
+        img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        fmt = "JPEG"
+    return out.getvalue(), fmt, has_metadata
+
+def make_thumbnail(data, size=THUMB_PX):
+    img = _flatten(ImageOps.exif_transpose(Image.open(io.BytesIO(data))))
+    img.thumbnail((size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=80)
+    return out.getvalue()
+
+def prepare_image(data, dpi=PRINT_DPI, cache=image_cache):
+    key = f"{hashlib.sha256(data).hexdigest()}:{dpi}"
+    hit = cache.get(key) if cache is not None else None
+    if hit is not None: return hit, True
+
+    start = time.perf_counter()
+    processed, fmt, has_metadata = _process(data, dpi)
+    if len(processed) >= len(data) and not has_metadata:
+        # Malý obrázek bez metadat už nezmenšíme – necháme originál.
+        # S EXIF/ICC bereme vždy nový soubor: zahodí GPS a má už aplikovanou orientaci
+        processed, fmt = data, "ORIG"
+    item = PreparedImage(processed, fmt, len(data), time.perf_counter() - start)
+    record("image.prepare", item.seconds, fmt=fmt, orig_bytes=len(data), bytes=len(processed))
+    if cache is not None: cache.put(key, item)
+    return item, False
+
+# ==========================================
+# ODKLÁDÁNÍ NAHRANÝCH OBRÁZKŮ NA DISK
+# Nahraný obrázek se v book_data nedrží v paměti, ale jako soubor ve spill
+# složce pojmenovaný hashem obsahu. SpilledImage má getvalue() jako
+# UploadedFile, takže ho sazba čte až ve chvíli, kdy stranu opravdu sází.
+# Složka má strop a stáří: mtime souboru = poslední použití (put i čtení)
+# a při ukládání se mažou nejdéle nepoužité. Smazaný obrázek se u strany
+# chová jako chybějící (SpilledImage je pak nepravdivý) a sazba dá zástupný text.
+# ==========================================
+def write_atomic(path, data):
+    # Souběžná relace nikdy neuvidí napůl zapsaný soubor
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f: f.write(data)
+    os.replace(tmp, path)
+
+class SpilledImage:
+    def __init__(self, path, digest, size):
+        self.path = path
+        self.digest = digest
+        self.size = size
+
+    def getvalue(self):
+        with open(self.path, "rb") as f: data = f.read()
+        touch(self.path)
+        return data
+
+    def __bool__(self):
+        return os.path.exists(self.path)
+
+def touch(path):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+def evict_lru(directory, max_bytes, max_age, keep=()):
+    # Nejdéle nepoužité soubory pryč (podle mtime), dokud složka nesplní stáří i strop
+    files = []
+    for entry in os.scandir(directory):
+        # Rozepsané .tmp jiného vlákna nemažeme
+        if not entry.is_file() or entry.name.endswith(".tmp"): continue
+        try:
+            st = entry.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    now = time.time()
+    removed = 0
+    for mtime, size, path in files:
+        if total <= max_bytes and now - mtime <= max_age: break
+        if path in keep: continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+class ImageSpill:
+    def __init__(self, directory=SPILL_DIR, max_bytes=SPILL_MAX_BYTES, max_age=SPILL_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.directory, digest)
+        if os.path.exists(path): touch(path)
+        else: write_atomic(path, data)
+        self.evict(keep=path)
+        return SpilledImage(path, digest, len(data))
+
+    def evict(self, keep=None):
+        with self.lock: return evict_lru(self.directory, self.max_bytes, self.max_age, {keep})
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
@@ -0,0 +1,47 @@
+# ==========================================
+# PRŮBĚŽNÉ ČTENÍ JSON POLE ZE STREAMU
+# Gemini posílá odpověď po kouscích. Parser hledá první '[' a vrací každý
+# objekt pole hned, jak se uzavře jeho '}' – nečeká na konec odpovědi.
+# ==========================================
+import json
+
+class JsonArrayStream:
+    def __init__(self):
+        self.started = False   # už jsme viděli otevírací '['
+        self.closed = False    # pole skončilo ']'
+        self.depth = 0         # hloubka vnoření uvnitř pole
+        self.in_string = False
+        self.escape = False
+        self.buf = []          # znaky rozpracovaného objektu
+
+    def feed(self, chunk):
+        items = []
+        for ch in chunk:
+            if self.closed: break
+            if not self.started:
+                if ch == '[': self.started = True
+                continue
+
+            if self.depth > 0: self.buf.append(ch)
+
+            if self.in_string:
+                if self.escape: self.escape = False
+                elif ch == '\\': self.escape = True
+                elif ch == '"': self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                if self.depth == 0: self.buf = [ch]
+                self.depth += 1
+            elif ch in '}]':
+                if self.depth == 0:
+                    # ']' na nejvyšší úrovni = konec celého pole
+                    self.closed = True
+                    continue
+                self.depth -= 1
+                if self.depth == 0:
+                    items.append(json.loads("".join(self.buf)))
+                    self.buf = []
+        return items
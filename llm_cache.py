@@ -0,0 +1,98 @@
+# ==========================================
+# DISKOVÁ CACHE ODPOVĚDÍ GEMINI
+# Klíč = sha256 z (model, celý prompt, expect_array). Ukládá se už
+# rozparsovaný JSON, takže rozbité odpovědi se do cache nikdy nedostanou.
+# Velikost je omezená, při přetečení se maže nejdéle nepoužitý záznam (LRU).
+# ==========================================
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "UNIKOVKY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm"),
+)
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+def cache_key(model_name, prompt, expect_array):
+    raw = json.dumps([model_name, prompt, bool(expect_array)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.index = OrderedDict()  # klíč -> velikost, od nejstaršího použití
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _load_index(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"): continue
+                st = os.stat(os.path.join(root, name))
+                entries.append((st.st_mtime, name[:-5], st.st_size))
+        for _, key, size in sorted(entries):
+            self.index[key] = size
+            self.total_bytes += size
+
+    def get(self, model_name, prompt, expect_array):
+        key = cache_key(model_name, prompt, expect_array)
+        with self.lock:
+            if key not in self.index:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), encoding="utf-8") as f: value = json.load(f)
+            except (OSError, ValueError):
+                # Soubor zmizel nebo je poškozený – bereme jako miss
+                self._drop(key)
+                self.misses += 1
+                return None
+            self.index.move_to_end(key)
+            os.utime(self._path(key))
+            self.hits += 1
+            return value
+
+    def put(self, model_name, prompt, expect_array, value):
+        key = cache_key(model_name, prompt, expect_array)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        path = self._path(key)
+        with self.lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+            if key in self.index: self.total_bytes -= self.index.pop(key)
+            self.index[key] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _drop(self, key):
+        self.total_bytes -= self.index.pop(key, 0)
+        try: os.remove(self._path(key))
+        except OSError: pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            self._drop(next(iter(self.index)))
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.index): self._drop(key)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self.index), "bytes": self.total_bytes}
@@ -0,0 +1,115 @@
+# ==========================================
+# MĚŘENÍ ČASU V HORKÝCH MÍSTECH
+# span("gemini.call") apod. změří blok kódu, zapíše ho jako JSON řádek do
+# loggeru "unikovky.metrics" a přidá ho do právě aktivního sběrače Metrics.
+# Aktivní sběrač se drží v contextvars, takže se nemíchají relace Streamlitu.
+# Do vláken a na smyčku událostí se musí kontext předat (viz bind_context).
+# ==========================================
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger("unikovky.metrics")
+current = contextvars.ContextVar("unikovky_metrics", default=None)
+
+def configure_log(path=None):
+    # JSON řádky do souboru, bez cesty na stderr. Volá se jednou na proces
+    # (batch.py, app.py přes st.cache_resource); stejný cíl se nepřidá dvakrát.
+    target = os.path.abspath(path) if path else None
+    for handler in logger.handlers:
+        if getattr(handler, "unikovky_target", False) == target: return handler
+    handler = logging.FileHandler(target, encoding="utf-8") if target else logging.StreamHandler(sys.stderr)
+    handler.unikovky_target = target
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+class Metrics:
+    def __init__(self, max_spans=5000):
+        self.max_spans = max_spans
+        self.spans = []
+        self.counters = Counter()
+        self.seq = 0            # pořadí posledního zapsaného úseku, přes reset neklesá
+        self.lock = threading.Lock()
+
+    def add_span(self, name, seconds, attrs):
+        with self.lock:
+            # seq odliší běhy: úseky jednoho běhu jsou ty se seq větším než značka před ním
+            self.seq += 1
+            self.spans.append({"name": name, "seconds": seconds, "seq": self.seq, **attrs})
+            # Držíme jen posledních max_spans záznamů, ať panel neroste donekonečna
+            if len(self.spans) > self.max_spans: del self.spans[:len(self.spans) - self.max_spans]
+
+    def incr(self, name, n=1):
+        with self.lock: self.counters[name] += n
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def summary(self):
+        with self.lock:
+            rows = {}
+            for s in self.spans:
+                row = rows.setdefault(s["name"], {"name": s["name"], "count": 0, "total_s": 0.0, "max_s": 0.0})
+                row["count"] += 1
+                row["total_s"] += s["seconds"]
+                row["max_s"] = max(row["max_s"], s["seconds"])
+            return sorted(rows.values(), key=lambda r: -r["total_s"])
+
+    def spans_named(self, name, since=0):
+        with self.lock: return [s for s in self.spans if s["name"] == name and s["seq"] > since]
+
+    def to_json(self):
+        with self.lock:
+            return json.dumps({"counters": dict(self.counters), "spans": list(self.spans)}, ensure_ascii=False, indent=2)
+
+def record(name, seconds, **attrs):
+    logger.info(json.dumps({"span": name, "seconds": round(seconds, 6), **attrs}, ensure_ascii=False, default=str))
+    metrics = current.get()
+    if metrics is not None: metrics.add_span(name, seconds, attrs)
+
+def incr(name, n=1):
+    logger.info(json.dumps({"counter": name, "inc": n}))
+    metrics = current.get()
+    if metrics is not None: metrics.incr(name, n)
+
+@contextmanager
+def span(name, **attrs):
+    # Do attrs může měřený blok připsat další údaje (např. velikost odpovědi)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        record(name, time.perf_counter() - start, **attrs)
+
+@contextmanager
+def collecting(metrics):
+    token = current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        current.reset(token)
+
+def bind_context(fn):
+    # Pro vlákna: funkce poběží se stejným aktivním sběračem jako volající
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+def record_retry(retry_state):
+    # before_sleep hook pro tenacity – počítá opakování a plánovanou pauzu
+    sleep = retry_state.next_action.sleep if retry_state.next_action else 0.0
+    error = retry_state.outcome.exception() if retry_state.outcome else None
+    incr("gemini.retries")
+    record("gemini.backoff", sleep, attempt=retry_state.attempt_number, error=type(error).__name__ if error else None)
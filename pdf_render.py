@@ -0,0 +1,445 @@
+# ==========================================
+# SAZBA PDF
+# Vykreslení hotové knihy (book_data) do PDF přes FPDF.
+# ==========================================
+import hashlib
+import io
+import json
+import os
+import re
+import string
+import tempfile
+import threading
+from collections import OrderedDict
+
+from fpdf import FPDF
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject
+
+from images import prepare_image
+from metrics import span
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts")
+FONT_PATH = os.path.join(FONT_DIR, "DejaVuSans.ttf")
+FONT_BOLD_PATH = os.path.join(FONT_DIR, "DejaVuSans-Bold.ttf")
+
+# Zvyš při změně sazby stránky, aby se zahodily stránky vysázené starým layoutem
+LAYOUT_VERSION = 1
+PAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024
+CHUNK_PAGES = 50                        # stran v jedné dávce velké knihy (fonty se načítají pro každou)
+SPOOL_MEMORY_BYTES = 16 * 1024 * 1024   # kolik dávek smí zůstat v paměti, zbytek jde na disk
+# Od kdy editor předvyplní sazbu po dávkách. Paměť žerou hlavně obrázky,
+# takže rozhoduje i jejich objem, nejen počet stran (editor jich dovolí ~30).
+LARGE_BOOK_PAGES = 24
+LARGE_BOOK_IMAGE_BYTES = 64 * 1024 * 1024
+
+# Znaky, které dostanou v podmnožině fontu pevné pořadí (viz new_pdf)
+FONT_CHARSET = (string.digits + string.ascii_letters + string.punctuation
+                + "ÁČĎÉĚÍŇÓŘŠŤÚŮÝŽáčďéěíňóřšťúůýž–—„“”‚‘’…°×•█")
+
+_fonts_ok = False
+
+def fonts_available():
+    # Kladný výsledek si pamatujeme pro celý proces; chybějící fonty se zkusí znovu
+    global _fonts_ok
+    if not _fonts_ok: _fonts_ok = os.path.exists(FONT_PATH) and os.path.exists(FONT_BOLD_PATH)
+    return _fonts_ok
+
+def new_pdf(stable_fonts=False):
+    # Rozparsovaný TTF sdílet mezi dokumenty nejde – FPDF ho při output() na místě
+    # ořízne na použité znaky. Proto jeden dokument na sazbu (viz render_book_incremental).
+    pdf = FPDF()
+    pdf.add_font("DejaVu", "", FONT_PATH)
+    pdf.add_font("DejaVu", "B", FONT_BOLD_PATH)
+    if stable_fonts:
+        # Podmnožina fontu čísluje znaky v pořadí prvního použití. Když je předem
+        # vybereme ve stejném pořadí, vyjde font v každém dokumentu bajtově stejný
+        # a PdfAssembler ho při skládání dávek vloží jen jednou.
+        # SubsetMap.pick je vnitřní API fpdf2 (requirements.txt drží ověřenou verzi);
+        # kdyby chybělo, sazba funguje dál, jen se font v každé dávce vloží znovu.
+        for font in pdf.fonts.values():
+            pick = getattr(getattr(font, "subset", None), "pick", None)
+            if pick is None: break
+            for ch in FONT_CHARSET: pick(ord(ch))
+    return pdf
+
+def render_page(pdf, puz):
+    pdf.add_page()
+
+    # --- LOGIKA STYLU (TABULKA vs TEXT) ---
+    is_grid_layout = "|" in puz['zadani'] and "---" in puz['zadani']
+
+    # 1. NADPIS
+    pdf.set_xy(10, 20)
+    pdf.set_font("DejaVu", "B", 26)
+    pdf.set_text_color(0, 0, 0)
+    pdf.cell(0, 15, puz['nadpis'], ln=True, align="C")
+
+    aktualni_y = 45
+
+    # 2. ZADÁNÍ
+    if is_grid_layout:
+        # Rozparsování Markdown tabulky pro PDF
+        pdf.set_font("DejaVu", "", 12)
+        lines = puz['zadani'].split('\n')
+        table_data = []
+        intro_text = ""
+
+        for line in lines:
+            if "|" in line:
+                cells = [c.strip() for c in line.strip().strip('|').split('|')]
+                if "---" not in cells[0]: table_data.append(cells)
+            else:
+                if line.strip(): intro_text += line + "\n"
+
+        if intro_text:
+            pdf.multi_cell(180, 6, intro_text, align="C")
+            aktualni_y = pdf.get_y() + 5
+
+        if table_data:
+            col_w = 180 / len(table_data[0])
+            row_h = 14 # Vyšší řádky
+            pdf.set_x(15)
+
+            # Hlavička
+            pdf.set_font("DejaVu", "B", 12)
+            for cell in table_data[0]:
+                pdf.cell(col_w, row_h, cell, border=1, align="C")
+            pdf.ln()
+
+            # Tělo tabulky
+            pdf.set_font("DejaVu", "", 12)
+            for row in table_data[1:]:
+                pdf.set_x(15)
+                for cell in row:
+                    txt = cell.replace("**", "")
+                    is_bold = "**" in cell
+                    pdf.set_font("DejaVu", "B" if is_bold else "", 12)
+                    pdf.cell(col_w, row_h, txt, border=1, align="C")
+                pdf.ln()
+            aktualni_y = pdf.get_y() + 10
+
+    else:
+        # Klasický text
+        pdf.set_xy(15, aktualni_y)
+        pdf.set_font("DejaVu", "", 14)
+        clean_text = puz['zadani'].replace("**", "")
+        pdf.multi_cell(180, 8, clean_text, align="C")
+        aktualni_y = pdf.get_y() + 10
+
+    # 3. OBRÁZEK
+    image_stats = None
+    uploaded_file = puz.get('uploaded_image')
+    if uploaded_file:
+        # Logika pro umístění
+        space_left = 240 - aktualni_y
+        if space_left > 50:
+            # Zmenšený obrázek z cache, vše jen v paměti bez dočasného souboru
+            prepared, cached = prepare_image(uploaded_file.getvalue())
+            pdf.image(io.BytesIO(prepared.data), x=25, y=aktualni_y, w=160)
+            image_stats = {
+                "format": prepared.fmt,
+                "orig_bytes": prepared.orig_bytes,
+                "bytes": len(prepared.data),
+                "seconds": 0.0 if cached else prepared.seconds,
+                "cached": cached,
+                # Při zásahu cache ušetříme celé původní zpracování
+                "saved_seconds": prepared.seconds if cached else 0.0,
+            }
+    else:
+        # Placeholder, když není obrázek
+        pdf.set_xy(25, aktualni_y)
+        pdf.set_font("DejaVu", "", 10)
+        pdf.set_text_color(150, 150, 150)
+        pdf.multi_cell(160, 10, f"(Obrázek chybí - zkopíruj si prompt):\n{puz['prompt']}", border=1, align="C")
+
+    # 4. KÓD (Styl Benny - Závorky)
+    pdf.set_xy(10, 255)
+    pdf.set_font("DejaVu", "B", 20)
+    pdf.set_text_color(0, 0, 0)
+
+    delka = len(str(puz['kod']))
+    zavorky = "   ".join(["[      ]"] * delka)
+    pdf.cell(0, 10, f"TAJNÝ KÓD:   {zavorky}", ln=True, align="C")
+
+    return image_stats
+
+def render_book(book_data, on_page=None, report=None):
+    pdf = new_pdf()
+    for i, puz in enumerate(book_data):
+        if on_page: on_page(i, len(book_data))
+        with span("pdf.page", strana=i + 1):
+            image_stats = render_page(pdf, puz)
+        if report is not None and image_stats: report.append({"strana": i + 1, **image_stats})
+    # Bez jména vrací FPDF hotový dokument jako bytearray
+    with span("pdf.output", pages=len(book_data)):
+        return bytes(pdf.output())
+
+def write_book(book_data, pdf_name, chunk_pages=None):
+    with open(pdf_name, "wb") as f:
+        if chunk_pages: render_book_chunked(book_data, f, chunk_pages)
+        else: f.write(render_book(book_data))
+    return pdf_name
+
+# ==========================================
+# SKLÁDÁNÍ PDF Z DÁVEK
+# Stránky z různých dokumentů se převedou na záznamy: každý nepřímý objekt
+# jako bajty, kde odkazy na jiné objekty jsou zástupné značky, a otisk
+# z obsahu včetně otisků odkazovaných objektů. PdfAssembler pak záznamy
+# zapisuje rovnou do výstupu, čísla objektů doplní až při zápisu a objekt se
+# stejným otiskem (font, obrázek) zapíše jen jednou. Nic se znovu neparsuje –
+# skládání je jen kopírování bajtů.
+# ==========================================
+PLACEHOLDER = 1_000_000_000
+PLACEHOLDER_RE = re.compile(rb"(?<!\d)1(\d{9}) 0 R")
+PAGES_ID = 2  # strom stran; 1 je katalog
+
+class PdfRecord:
+    __slots__ = ("head", "tail", "children")
+
+    def __init__(self, head, tail, children):
+        self.head = head          # slovník se zástupnými odkazy
+        self.tail = tail          # data streamu (bez úprav), u slovníku prázdné
+        self.children = children  # otisky odkazovaných objektů, podle čísla značky
+
+    @property
+    def size(self):
+        return len(self.head) + len(self.tail)
+
+def extract_records(reader, records):
+    # Vrátí otisky stran dokumentu; záznamy všech objektů přidá do records
+    pages = {page.indirect_reference.idnum: page for page in reader.pages}
+    memo = {}
+
+    def record(ref):
+        if ref.idnum in memo: return memo[ref.idnum]
+        # reader.pages má zděděné atributy (Resources, MediaBox) už přenesené na stranu
+        obj = pages.get(ref.idnum) or ref.get_object()
+        children = []
+
+        def swap(value):
+            if isinstance(value, IndirectObject):
+                children.append(record(value))
+                return IndirectObject(PLACEHOLDER + len(children) - 1, 0, None)
+            if isinstance(value, DictionaryObject):
+                for key, item in list(value.items()):
+                    value[key] = IndirectObject(PAGES_ID, 0, None) if key == "/Parent" else swap(item)
+            elif isinstance(value, ArrayObject):
+                for n, item in enumerate(value): value[n] = swap(item)
+            return value
+
+        buf = io.BytesIO()
+        swap(obj).write_to_stream(buf)
+        head, sep, data = buf.getvalue().partition(b"\nstream\n")
+        rec = PdfRecord(head, sep + data, tuple(children))
+        h = hashlib.sha256(rec.head + rec.tail)
+        for child in children: h.update(child.encode())
+        digest = h.hexdigest()
+        if ref.idnum in pages:
+            # Dvě stejné strany jsou v PDF dva objekty – otisk doplníme o pořadí
+            digest = f"{digest}:{ref.idnum}"
+        records.setdefault(digest, rec)
+        memo[ref.idnum] = digest
+        return digest
+
+    return [record(page.indirect_reference) for page in reader.pages]
+
+class PdfAssembler:
+    def __init__(self, out):
+        self.out = out
+        self.start = out.tell()
+        self.offsets = {}
+        self.written = {}   # otisk -> číslo objektu ve výstupu
+        self.kids = []
+        self.next_id = PAGES_ID + 1
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _begin(self, num):
+        self.offsets[num] = self.out.tell() - self.start
+        self.out.write(f"{num} 0 obj\n".encode())
+
+    def _emit(self, digest, records):
+        num = self.written.get(digest)
+        if num is not None: return num
+        rec = records[digest]
+        ids = [self._emit(child, records) for child in rec.children]
+        num = self.written[digest] = self.next_id
+        self.next_id += 1
+        self._begin(num)
+        self.out.write(PLACEHOLDER_RE.sub(lambda m: b"%d 0 R" % ids[int(m.group(1))], rec.head))
+        self.out.write(rec.tail)
+        self.out.write(b"\nendobj\n")
+        return num
+
+    def add_pages(self, page_digests, records):
+        for digest in page_digests:
+            # Stejná strana podruhé v knize musí být nový objekt, ne odkaz na první
+            if digest in self.written: self.written.pop(digest)
+            self.kids.append(self._emit(digest, records))
+
+    def finish(self):
+        out = self.out
+        self._begin(PAGES_ID)
+        out.write(f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in self.kids)}] /Count {len(self.kids)} >>\nendobj\n".encode())
+        self._begin(1)
+        out.write(f"<< /Type /Catalog /Pages {PAGES_ID} 0 R >>\nendobj\n".encode())
+        xref = out.tell() - self.start
+        out.write(f"xref\n0 {self.next_id}\n0000000000 65535 f \n".encode())
+        for num in range(1, self.next_id): out.write(f"{self.offsets[num]:010d} 00000 n \n".encode())
+        out.write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+        return len(self.kids)
+
+# ==========================================
+# PŘÍRŮSTKOVÁ SAZBA
+# Každá strana má otisk z textů a hashe obrázku. Vysázené strany se drží
+# v cache jako záznamy pro PdfAssembler, znovu se sází jen strany se
+# změněným otiskem. Fonty mají ve všech dávkách stejnou podmnožinu
+# (new_pdf(stable_fonts=True)), takže se při skládání sloučí a soubor
+# s počtem úprav neroste.
+# ==========================================
+def page_fingerprint(puz):
+    h = hashlib.sha256()
+    texts = [LAYOUT_VERSION, puz.get('nadpis'), puz.get('zadani'), puz.get('kod'), puz.get('prompt')]
+    h.update(json.dumps(texts, ensure_ascii=False).encode("utf-8"))
+    uploaded_file = puz.get('uploaded_image')
+    if uploaded_file:
+        # Obrázek odložený na disk (SpilledImage) zná svůj hash – nemusíme ho číst
+        digest = getattr(uploaded_file, "digest", None)
+        h.update(bytes.fromhex(digest) if digest else hashlib.sha256(uploaded_file.getvalue()).digest())
+    return h.hexdigest()
+
+class CachedPages:
+    def __init__(self, pages, records):
+        self.pages = pages        # otisky stran jedné šifry (může přetéct na víc stran)
+        self.records = records    # záznamy dosažitelné z těchto stran
+        self.size = sum(rec.size for rec in records.values())
+
+def _reachable(page_digests, records):
+    found = {}
+    stack = list(page_digests)
+    while stack:
+        digest = stack.pop()
+        if digest in found: continue
+        found[digest] = records[digest]
+        stack.extend(found[digest].children)
+    return found
+
+class PageCache:
+    def __init__(self, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None: self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        # Záznamy sdílené mezi stranami (font) se počítají u každé – odhad shora
+        with self.lock:
+            if key in self.entries: self.total_bytes -= self.entries.pop(key).size
+            self.entries[key] = entry
+            self.total_bytes += entry.size
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.total_bytes -= old.size
+
+page_cache = PageCache()
+
+def render_book_incremental(book_data, on_page=None, report=None, stats=None, cache=page_cache):
+    fingerprints = [page_fingerprint(puz) for puz in book_data]
+    # Lokální kopie – jiná relace nám mezitím může stránku z cache vyhodit
+    pages = {fp: cache.get(fp) for fp in set(fingerprints)}
+    dirty, seen = [], set()
+    for i, fp in enumerate(fingerprints):
+        # Stejný obsah na víc stranách stačí vysázet jednou
+        if pages[fp] is None and fp not in seen:
+            seen.add(fp)
+            dirty.append(i)
+
+    if dirty:
+        # Všechny změněné strany v jednom dokumentu, ať se fonty načítají jen jednou
+        pdf = new_pdf(stable_fonts=True)
+        ranges = []
+        for n, i in enumerate(dirty):
+            if on_page: on_page(n, len(dirty))
+            start = pdf.page_no()
+            with span("pdf.page", strana=i + 1):
+                image_stats = render_page(pdf, book_data[i])
+            ranges.append((start, pdf.page_no()))
+            if report is not None and image_stats: report.append({"strana": i + 1, **image_stats})
+        with span("pdf.output", pages=len(dirty)):
+            batch = bytes(pdf.output())
+        with span("pdf.split", pages=len(dirty)):
+            records = {}
+            page_digests = extract_records(PdfReader(io.BytesIO(batch)), records)
+            for i, (start, end) in zip(dirty, ranges):
+                own = page_digests[start:end]
+                entry = CachedPages(own, _reachable(own, records))
+                pages[fingerprints[i]] = entry
+                cache.put(fingerprints[i], entry)
+
+    if stats is not None:
+        stats["rendered"] = len(dirty)
+        stats["reused"] = len(book_data) - len(dirty)
+    with span("pdf.merge", pages=len(fingerprints)):
+        out = io.BytesIO()
+        assembler = PdfAssembler(out)
+        for fp in fingerprints: assembler.add_pages(pages[fp].pages, pages[fp].records)
+        assembler.finish()
+        return out.getvalue()
+
+# ==========================================
+# SAZBA VELKÝCH KNIH PO DÁVKÁCH
+# FPDF drží celý dokument v paměti, takže u stovek stran s obrázky roste
+# paměť bez omezení. Tady se sází po CHUNK_PAGES stranách, každá dávka jde
+# do SpooledTemporaryFile (po vyčerpání SPOOL_MEMORY_BYTES na disk) a na konci
+# se dávky jedna po druhé převedou na záznamy a PdfAssembler je zapíše rovnou
+# do výstupu. V paměti jsou vždy záznamy jen jedné dávky, z ostatních jen
+# pozice a otisky zapsaných objektů.
+# ==========================================
+def is_large_book(book_data):
+    # UploadedFile i SpilledImage znají velikost bez čtení dat
+    image_bytes = sum(getattr(puz.get('uploaded_image'), "size", 0) or 0 for puz in book_data)
+    return len(book_data) > LARGE_BOOK_PAGES or image_bytes > LARGE_BOOK_IMAGE_BYTES
+
+def stream_merge(parts, out):
+    assembler = PdfAssembler(out)
+    for part in parts:
+        part.seek(0)
+        records = {}
+        assembler.add_pages(extract_records(PdfReader(part), records), records)
+    return assembler.finish()
+
+def render_book_chunked(book_data, out, chunk_pages=CHUNK_PAGES, on_page=None, report=None):
+    # out = binární soubor (otevřený soubor, SpooledTemporaryFile...), PDF se zapíše do něj
+    parts = []
+    in_memory = 0
+    try:
+        for first in range(0, len(book_data), chunk_pages):
+            # Stejná podmnožina fontu ve všech dávkách – ve výsledku bude font jen jednou
+            pdf = new_pdf(stable_fonts=True)
+            for i in range(first, min(first + chunk_pages, len(book_data))):
+                if on_page: on_page(i, len(book_data))
+                with span("pdf.page", strana=i + 1):
+                    image_stats = render_page(pdf, book_data[i])
+                if report is not None and image_stats: report.append({"strana": i + 1, **image_stats})
+
+            part = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+            with span("pdf.output", pages=pdf.page_no(), chunk=len(parts)):
+                data = pdf.output()
+                part.write(data)
+            in_memory += len(data)
+            # Dokud se dávky vejdou do rozpočtu, zůstanou v paměti; pak už jdou rovnou na disk
+            if in_memory > SPOOL_MEMORY_BYTES: part.rollover()
+            parts.append(part)
+            del pdf, data
+
+        with span("pdf.merge", pages=len(book_data), chunks=len(parts)):
+            stream_merge(parts, out)
+    finally:
+        for part in parts: part.close()
+    return out
@@ -0,0 +1,183 @@
+# ==========================================
+# PLÁNOVAČ DOTAZŮ NA GEMINI
+# Všechny relace sdílí jeden GOOGLE_API_KEY, takže i jednu kvótu. Plánovač
+# před Gemini drží společný limit (token bucket), střídá relace po jednom
+# dotazu (fér fronta – dlouhá kniha nezablokuje ostatní) a stejný dotaz,
+# který už právě běží, neposílá podruhé – čekatelé dostanou stejnou odpověď.
+# Odpověď 429 zastaví odesílání pro všechny a dotaz se vrátí na začátek fronty,
+# místo aby každý volající sám opakoval a kvótu dál přetěžoval.
+#
+# Aktivní plánovač a relace se drží v contextvars (jako sběrač měření):
+#   with queued(scheduler, session_id): generate_book(...)
+# ==========================================
+import contextvars
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+from metrics import bind_context, record
+
+current = contextvars.ContextVar("unikovky_scheduler", default=None)
+
+# Kolik dotazů smí odejít naráz. S burst 1 by každá relace čekala na žeton
+# po jednom a souběžné knihy by se seřadily za sebe; limit za minutu hlídá rate.
+DEFAULT_BURST = 5.0
+
+def is_rate_limited(error):
+    # genai.errors.APIError má .code, falešný klient a server vrací totéž
+    return getattr(error, "code", None) == 429
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        if not rate or rate <= 0: raise ValueError(f"Limit dotazů musí být kladný, ne {rate!r}.")
+        if burst is not None and burst < 1: raise ValueError(f"Burst musí být aspoň 1, ne {burst!r}.")
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def take(self, now):
+        # 0 = žeton odebrán, jinak za kolik sekund zkusit znovu
+        if now < self.blocked_until: return self.blocked_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def block(self, seconds, now):
+        # Po 429 se nic neposílá a žetony se začnou doplňovat až po pauze
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.blocked_until
+
+class Job:
+    def __init__(self, session_id, key, fn):
+        self.session_id = session_id
+        self.key = key
+        self.fn = fn
+        self.future = Future()
+        self.rate_limited = 0
+
+class Scheduler:
+    def __init__(self, rate_per_sec=1.0, burst=DEFAULT_BURST, workers=8, max_rate_retries=5, cooldown=2.0, max_cooldown=60.0):
+        self.bucket = TokenBucket(rate_per_sec, DEFAULT_BURST if burst is None else burst)
+        self.max_rate_retries = max_rate_retries
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cond = threading.Condition()
+        self.queues = {}        # relace -> fronta jejích dotazů
+        self.ring = deque()     # relace s čekajícími dotazy v pořadí, v jakém přijdou na řadu
+        self.in_flight = {}     # klíč dotazu -> Future, kvůli slučování stejných dotazů
+        self.strikes = 0        # 429 za sebou – pauza se s každou zdvojnásobí
+        self.stats = Counter()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini-sched")
+        threading.Thread(target=self._dispatch, name="gemini-scheduler", daemon=True).start()
+
+    def submit(self, session_id, fn, key=None):
+        with self.cond:
+            if key is not None and key in self.in_flight:
+                self.stats["deduplicated"] += 1
+                return self.in_flight[key]
+            job = Job(session_id, key, fn)
+            if key is not None: self.in_flight[key] = job.future
+            self.stats["submitted"] += 1
+            self._enqueue(job)
+            return job.future
+
+    def position(self, session_id):
+        # Kolikátá je relace na řadě (každá relace před ní pošle jeden dotaz), None = nic nečeká
+        with self.cond:
+            if session_id not in self.queues: return None
+            return {
+                "position": self.ring.index(session_id) + 1,
+                "waiting": len(self.queues[session_id]),
+                "sessions": len(self.ring),
+                "cooldown": max(0.0, self.bucket.blocked_until - time.monotonic()),
+            }
+
+    def _enqueue(self, job, front=False):
+        queue = self.queues.setdefault(job.session_id, deque())
+        if front:
+            # Dotaz odmítnutý 429 jde po pauze jako první, ne na konec kola
+            queue.appendleft(job)
+            if job.session_id in self.ring: self.ring.remove(job.session_id)
+            self.ring.appendleft(job.session_id)
+        else:
+            queue.append(job)
+            if job.session_id not in self.ring: self.ring.append(job.session_id)
+        self.cond.notify()
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                while not self.ring: self.cond.wait()
+                delay = self.bucket.take(time.monotonic())
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                session_id = self.ring.popleft()
+                queue = self.queues[session_id]
+                job = queue.popleft()
+                # Relace s dalšími dotazy jde na konec kola
+                if queue: self.ring.append(session_id)
+                else: del self.queues[session_id]
+            self.pool.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            result = job.fn()
+        except Exception as e:
+            if is_rate_limited(e) and job.rate_limited < self.max_rate_retries:
+                job.rate_limited += 1
+                with self.cond:
+                    self.strikes += 1
+                    self.stats["rate_limited"] += 1
+                    self.bucket.block(min(self.max_cooldown, self.cooldown * 2 ** (self.strikes - 1)), time.monotonic())
+                    self._enqueue(job, front=True)
+                return
+            self._finish(job)
+            job.future.set_exception(e)
+        else:
+            with self.cond: self.strikes = 0
+            self._finish(job)
+            job.future.set_result(result)
+
+    def _finish(self, job):
+        # Klíč uvolníme před vyřízením, další stejný dotaz už půjde znovu do fronty
+        with self.cond:
+            if job.key is not None and self.in_flight.get(job.key) is job.future: del self.in_flight[job.key]
+
+@contextmanager
+def queued(scheduler, session_id):
+    token = current.set((scheduler, session_id) if scheduler else None)
+    try:
+        yield scheduler
+    finally:
+        current.reset(token)
+
+def bind_session(scheduler, session_id, fn):
+    # Pro vlákna dávkového běhu: fn poběží jako dotazy dané relace
+    def run(*args, **kwargs):
+        with queued(scheduler, session_id): return fn(*args, **kwargs)
+    return run
+
+def submit_queued(fn, key=None):
+    # Pošle fn přes aktivní plánovač; měření se připíše sběrači volajícího
+    scheduler, session_id = current.get()
+    submitted = time.perf_counter()
+
+    def timed():
+        record("gemini.queue_wait", time.perf_counter() - submitted, session=session_id)
+        return fn()
+
+    return scheduler.submit(session_id, bind_context(timed), key)
+
+def run_queued(fn, key=None):
+    # Bez aktivního plánovače se volá rovnou
+    if current.get() is None: return fn()
+    return submit_queued(fn, key).result()
@@ -0,0 +1,5 @@
+# Moduly projektu leží v kořeni repozitáře (app.py, engine.py...), ne v balíčku
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+from test_pdf_render import book
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    for name in ("UNIKOVKY_CACHE_DIR", "UNIKOVKY_SPILL_DIR", "UNIKOVKY_IMAGE_DIR"):
+        monkeypatch.setenv(name, str(tmp_path / name))
+    at = AppTest.from_file("../app.py", default_timeout=120)
+    at.secrets["APP_PASSWORD"] = "heslo"
+    at.secrets["GOOGLE_API_KEY"] = "offline"
+    at.run()
+    at.sidebar.text_input[0].input("heslo").run()
+    return at
+
+def render_pdf(at, pages, velka_kniha):
+    at.session_state.book_data = pages
+    at.session_state.book_theme = "Piráti"
+    at.session_state.generated = True
+    at.run()
+    checkbox = next(c for c in at.checkbox if c.label.startswith("📚 Velká kniha"))
+    checkbox.set_value(velka_kniha).run()
+    next(b for b in at.button if "Vygenerovat PDF" in b.label).click().run()
+    assert not at.exception
+    return [b.label for b in at.get("download_button")]
+
+@pytest.mark.parametrize("velka_kniha", [False, True])
+def test_pdf_download_offered(app, velka_kniha):
+    assert "📥 Stáhnout PDF" in render_pdf(app, book(6), velka_kniha)
+
+def test_large_book_is_default_above_threshold(app):
+    app.session_state.book_data = book(30)
+    app.session_state.generated = True
+    app.run()
+    assert next(c for c in app.checkbox if c.label.startswith("📚 Velká kniha")).value
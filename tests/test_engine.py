@@ -0,0 +1,177 @@
+import json
+
+import pytest
+
+from catalog import PUZZLE_CATALOG
+from engine import build_master_prompt, build_page_prompt, generate_book, generate_book_per_page, stream_book
+from fake_gemini import FakeClient, fake_page, fake_text
+from generators import LOCAL_GENERATORS
+from llm_cache import ResponseCache
+
+AI_KEYS = [k for k in PUZZLE_CATALOG if k not in LOCAL_GENERATORS]
+LOCAL_KEYS = list(LOCAL_GENERATORS)
+MODEL = "fake-model"
+
+def test_stream_book_keeps_page_order_and_type_keys():
+    keys = [AI_KEYS[0], LOCAL_KEYS[0], AI_KEYS[1], AI_KEYS[2], LOCAL_KEYS[1]]
+    client = FakeClient(chunk_size=5)
+    pages = list(stream_book(client, "Piráti", keys, MODEL, seed=1, max_repairs=0))
+    assert [p["type_key"] for p in pages] == keys
+    # AI strany jdou ze streamu ve stejném pořadí, jak je model vypsal
+    assert [p["nadpis"] for p in pages if p["type_key"] in AI_KEYS] == ["Strana 1", "Strana 2", "Strana 3"]
+
+@pytest.mark.parametrize("responder", [
+    lambda prompt: fake_text(prompt)[:200],                     # useknuto limitem výstupu
+    lambda prompt: "[koncept] " + fake_text(prompt),            # '[' před polem
+])
+def test_incomplete_stream_raises_and_is_not_cached(tmp_path, responder):
+    keys = AI_KEYS[:3]
+    cache = ResponseCache(str(tmp_path))
+    client = FakeClient(chunk_size=16, responder=responder)
+    with pytest.raises(ValueError):
+        list(stream_book(client, "Piráti", keys, MODEL, cache=cache, attempts=1, local=False, max_repairs=0))
+    # generate_book pro stejné téma čte stejný klíč – neúplná kniha tam nesmí být
+    assert cache.get(MODEL, build_master_prompt("Piráti", keys), True) is None
+
+def test_more_pages_than_requested_raises():
+    keys = AI_KEYS[:2]
+    client = FakeClient(responder=lambda prompt: fake_text(prompt.replace("Počet stran: 2", "Počet stran: 3")))
+    with pytest.raises(ValueError):
+        list(stream_book(client, "Piráti", keys, MODEL, attempts=1, local=False, max_repairs=0))
+
+def test_complete_stream_cached_for_generate_book(tmp_path):
+    keys = AI_KEYS[:3]
+    cache = ResponseCache(str(tmp_path))
+    client = FakeClient(chunk_size=16)
+    streamed = list(stream_book(client, "Piráti", keys, MODEL, cache=cache, local=False, max_repairs=0))
+    calls = client.call_count
+    book = generate_book(client, "Piráti", keys, MODEL, cache=cache, local=False, max_repairs=0)
+    assert client.call_count == calls
+    assert [p["nadpis"] for p in book] == [p["nadpis"] for p in streamed]
+
+# ==========================================
+# KONTROLA A OPRAVA STRAN
+# ==========================================
+REPAIR_KEYS = ["hidden_objects", "matching", "logic_elimination"]
+GOOD = {
+    "hidden_objects": {"zadani": "Spočítej:\n1. Kolik?\n2. Kolik?\n3. Kolik?", "kod": "524"},
+    "matching": {"zadani": "Přiřaď předměty.", "kod": "2312"},
+    "logic_elimination": {"zadani": "Čtvery dveře.", "kod": "3"},
+}
+BAD = {
+    "hidden_objects": {"zadani": "Spočítej:\n1. Kolik?\n2. Kolik?\n3. Kolik?", "kod": "52"},
+    "matching": {"zadani": "Přiřaď předměty.", "kod": "4444"},
+}
+
+@pytest.fixture
+def no_retry_wait(monkeypatch):
+    import engine
+    from tenacity import wait_none
+    monkeypatch.setattr(engine, "call_gemini_async", engine.call_gemini_async.retry_with(wait=wait_none()))
+
+def full_page(key, fields, n=0):
+    return {"nadpis": f"{key} {n}", "prompt": "Scene.", **fields}
+
+def page_key(prompt):
+    # Opravný prompt je prompt jedné strany – poznáme ji podle fragmentu šifry
+    from engine import puzzle_fragment
+    return next(k for k in REPAIR_KEYS if puzzle_fragment(k, "Piráti") in prompt)
+
+def repair_responder(book, page_fields):
+    attempts = []
+
+    def respond(prompt):
+        if "Počet stran" in prompt: return json.dumps([full_page(k, book[k]) for k in REPAIR_KEYS], ensure_ascii=False)
+        key = page_key(prompt)
+        attempts.append(key)
+        fields = page_fields(key, attempts.count(key))
+        if isinstance(fields, Exception): raise fields
+        return json.dumps(full_page(key, fields, attempts.count(key)), ensure_ascii=False)
+
+    return respond, attempts
+
+def test_bad_pages_get_one_targeted_repair_each():
+    respond, attempts = repair_responder({**GOOD, **BAD}, lambda key, n: GOOD[key])
+    client = FakeClient(responder=respond)
+    book = generate_book(client, "Piráti", REPAIR_KEYS, MODEL, local=False, max_repairs=2)
+    assert sorted(attempts) == ["hidden_objects", "matching"]
+    assert [p["kod"] for p in book] == ["524", "2312", "3"]
+    # Opravný dotaz nese konkrétní chyby
+    repair_prompts = [contents for _, contents in client.calls if "Předchozí pokus" in contents]
+    assert len(repair_prompts) == 2 and any("'52'" in p or "2 číslic" in p for p in repair_prompts)
+
+def test_good_pages_never_reasked():
+    respond, attempts = repair_responder(GOOD, lambda key, n: GOOD[key])
+    client = FakeClient(responder=respond)
+    generate_book(client, "Piráti", REPAIR_KEYS, MODEL, local=False, max_repairs=2)
+    assert attempts == [] and client.call_count == 1
+
+def test_repairs_stop_at_max_attempts_and_keep_original():
+    # Kandidát je pokaždé jinak, ale stejně vadný – původní strana zůstane
+    respond, attempts = repair_responder({**GOOD, **BAD}, lambda key, n: dict(BAD[key], kod=str(n + 3) * len(BAD[key]["kod"])))
+    client = FakeClient(responder=respond)
+    book = generate_book(client, "Piráti", REPAIR_KEYS, MODEL, local=False, max_repairs=3)
+    assert attempts.count("hidden_objects") == 3 and attempts.count("matching") == 3
+    assert [p["kod"] for p in book] == ["52", "4444", "3"]
+
+def test_failed_repairs_counted(no_retry_wait):
+    from metrics import Metrics, collecting
+    respond, attempts = repair_responder({**GOOD, **BAD}, lambda key, n: RuntimeError("výpadek"))
+    metrics = Metrics()
+    with collecting(metrics):
+        book = generate_book(FakeClient(responder=respond), "Piráti", REPAIR_KEYS, MODEL, local=False, max_repairs=2)
+    assert [p["kod"] for p in book] == ["52", "4444", "3"]
+    assert metrics.counters["pages.repair_attempts"] == 4
+    assert metrics.counters["pages.repair_failures"] == 4
+
+# ==========================================
+# KNIHA PO STRANÁCH
+# ==========================================
+def count_concurrency(client):
+    models = client.aio.models
+    original = models.generate_content
+    state = {"active": 0, "max": 0}
+
+    async def counted(model, contents):
+        state["active"] += 1
+        state["max"] = max(state["max"], state["active"])
+        try:
+            return await original(model=model, contents=contents)
+        finally:
+            state["active"] -= 1
+
+    models.generate_content = counted
+    return state
+
+def test_per_page_order_and_concurrency_bound():
+    keys = AI_KEYS[:8]
+    client = FakeClient(latency=0.05)
+    state = count_concurrency(client)
+    pages = generate_book_per_page(client, "Piráti", keys, MODEL, concurrency=3, local=False, max_repairs=0)
+    assert [p["type_key"] for p in pages] == keys
+    prompts = [build_page_prompt("Piráti", k, i, len(keys)) for i, k in enumerate(keys)]
+    assert [p["zadani"] for p in pages] == [fake_page(prompt)["zadani"] for prompt in prompts]
+    assert state["max"] == 3
+
+def test_failing_page_retries_without_holding_a_slot(monkeypatch):
+    import engine
+    from tenacity import wait_fixed
+    monkeypatch.setattr(engine, "call_gemini_async", engine.call_gemini_async.retry_with(wait=wait_fixed(0.3)))
+    keys = AI_KEYS[:4]
+    bad = build_page_prompt("Piráti", keys[0], 0, len(keys))
+    failures = []
+
+    def respond(prompt):
+        if prompt == bad and len(failures) < 2:
+            failures.append(prompt)
+            raise RuntimeError("výpadek")
+        return fake_text(prompt)
+
+    client = FakeClient(latency=0.05, responder=respond)
+    pages = generate_book_per_page(client, "Piráti", keys, MODEL, concurrency=1, local=False, max_repairs=0)
+    assert [p["type_key"] for p in pages] == keys
+    sent = [contents for _, contents in client.calls]
+    # Opakuje se jen vadná strana, ostatní šly jednou – a to během její pauzy, ne až po ní
+    assert sent.count(bad) == 3
+    assert all(sent.count(p) == 1 for p in sent if p != bad)
+    assert sent.index(build_page_prompt("Piráti", keys[1], 1, len(keys))) < sent.index(bad, 1)
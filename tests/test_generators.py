@@ -0,0 +1,122 @@
+import re
+from itertools import product
+
+import pytest
+
+from generators import ALPHABET, DIGITS, MORSE, digit_bitmap, generate_local_page, line_clue
+
+SEEDS = range(60)
+TEMATA = ["Piráti", "Vesmír", "Les"]
+
+def pages(key):
+    for tema, seed in product(TEMATA, SEEDS):
+        yield generate_local_page(key, tema, seed)
+
+def table(zadani):
+    # Markdown tabulka ze zadání -> hlavička a řádky buněk
+    lines = [line for line in zadani.splitlines() if line.startswith("|")]
+    rows = [[cell.strip() for cell in line[1:-1].split("|")] for line in lines]
+    return rows[0], rows[2:]
+
+def bold(zadani):
+    return re.search(r"\*\*(.+?)\*\*", zadani).group(1)
+
+def test_caesar_shift_back():
+    for page in pages("caesar"):
+        shift = int(re.search(r"posunuté o (\d+)", page["zadani"]).group(1))
+        plain = "".join(ALPHABET[(ALPHABET.index(ch) - shift) % 26] for ch in bold(page["zadani"]))
+        assert plain == page["kod"]
+
+def test_morse_decodes():
+    reverse = {code: ch for ch, code in MORSE.items()}
+    for page in pages("morse"):
+        zprava = page["zadani"].splitlines()[1]
+        letters = [
+            reverse["".join("." if s == "píp" else "-" for s in group.split())]
+            for group in zprava.split(" / ")
+        ]
+        assert "".join(letters) == page["kod"]
+
+def test_mirror_reversed():
+    for page in pages("mirror_writing"):
+        assert bold(page["zadani"])[::-1] == page["kod"]
+
+def test_diagonal_acrostic_reads_diagonal():
+    for page in pages("diagonal_acrostic"):
+        _, rows = table(page["zadani"])
+        assert "".join(row[i] for i, row in enumerate(rows)) == page["kod"]
+
+def test_classic_maze_path_digits():
+    for page in pages("classic_maze"):
+        header, rows = table(page["zadani"])
+        grid = [header] + rows
+        cells = {(x, y): c for y, row in enumerate(grid) for x, c in enumerate(row)}
+        start = next(p for p, c in cells.items() if c == "S")
+        goal = next(p for p, c in cells.items() if c == "C")
+        prev, queue = {start: None}, [start]
+        for cx, cy in queue:
+            for nxt in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+                if cells.get(nxt, "█") != "█" and nxt not in prev:
+                    prev[nxt] = (cx, cy)
+                    queue.append(nxt)
+        path, node = [], goal
+        while node:
+            path.append(node)
+            node = prev[node]
+        digits = "".join(cells[p] for p in reversed(path) if cells[p].isdigit())
+        assert digits == page["kod"]
+
+def test_word_search_leftover_spells_secret():
+    directions = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+    for page in pages("word_search_leftover"):
+        _, grid = table(page["zadani"])
+        size = len(grid)
+        words = re.search(r"Vyškrtej slova: (.+?)\. ", page["zadani"]).group(1).split(", ")
+        crossed = set()
+        for word in words:
+            found = False
+            for (dx, dy), y, x in product(directions, range(size), range(size)):
+                cells = [(x + dx * k, y + dy * k) for k in range(len(word))]
+                if all(0 <= cx < size and 0 <= cy < size and grid[cy][cx] == word[k] for k, (cx, cy) in enumerate(cells)):
+                    crossed.update(cells)
+                    found = True
+            assert found, word
+        leftover = "".join(grid[y][x] for y in range(size) for x in range(size) if (x, y) not in crossed)
+        assert leftover == page["kod"]
+
+def test_coordinate_drawing_shows_code():
+    for page in pages("coordinate_drawing"):
+        coords = re.search(r"Vybarvi políčka: (.+?)\. ", page["zadani"]).group(1).split(", ")
+        grid = [["0"] * 7 for _ in range(5)]
+        for coord in coords:
+            grid[int(coord[1:]) - 1]["ABCDEFG".index(coord[0])] = "1"
+        assert ["".join(row) for row in grid] == digit_bitmap(page["kod"])
+
+def test_matrix_indexing_lookup():
+    for page in pages("matrix_indexing"):
+        _, rows = table(page["zadani"])
+        size = len(rows)
+        letters = [row[1:size + 1] for row in rows]
+        numbers = [row[size + 2:] for row in rows]
+        found = {int(n): letters[r][c] for r in range(size) for c, n in enumerate(numbers[r]) if n}
+        assert "".join(found[n] for n in sorted(found)) == page["kod"]
+        assert sorted(found) == list(range(1, len(page["kod"]) + 1))
+
+def nonogram_solutions(row_clues, col_clues, width):
+    options = [[o for o in (f"{n:0{width}b}" for n in range(2 ** width)) if line_clue(o) == clue] for clue in row_clues]
+    return [rows for rows in product(*options)
+            if all(line_clue("".join(row[c] for row in rows)) == col_clues[c] for c in range(width))]
+
+def test_nonogram_unique_solution_is_code():
+    for page in pages("nonogram"):
+        header, rows = table(page["zadani"])
+        clue = lambda text: [int(n) for n in text.split()]
+        col_clues = [clue(c) for c in header[1:]]
+        row_clues = [clue(row[0]) for row in rows]
+        solutions = nonogram_solutions(row_clues, col_clues, len(col_clues))
+        assert solutions == [tuple(digit_bitmap(page["kod"]))]
+
+@pytest.mark.parametrize("code", sorted(DIGITS))
+def test_digit_bitmap_shape(code):
+    grid = digit_bitmap(code * 2)
+    assert len(grid) == 5 and all(len(row) == 7 for row in grid)
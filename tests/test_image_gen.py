@@ -0,0 +1,116 @@
+import io
+
+import pytest
+from tenacity import wait_none
+
+import image_gen
+from fake_gemini import FakeImageBackend
+from image_gen import GeneratedImageStore, build_image_prompt, generate_images
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    # Opakování bez dvousekundové pauzy – počet pokusů zůstává stejný
+    monkeypatch.setattr(image_gen, "generate_image_with_retry", image_gen.generate_image_with_retry.retry_with(wait=wait_none()))
+
+def page(prompt, **extra):
+    return {"nadpis": "Strana", "zadani": "", "kod": "1", "prompt": prompt, **extra}
+
+def states(rows):
+    return [row["stav"] for row in rows]
+
+class FailingPrompt(FakeImageBackend):
+    # Jeden prompt selže vždycky, ostatní projdou
+    def __init__(self, bad):
+        super().__init__()
+        self.bad = bad
+
+    async def generate(self, prompt):
+        if self.bad in prompt:
+            self.attempts[prompt] += 1
+            raise ValueError("Model nevrátil žádný obrázek.")
+        return await super().generate(prompt)
+
+def test_each_page_retried_until_success(tmp_path):
+    backend = FakeImageBackend(fail_first=2, size=(64, 48))
+    book = [page("kotva"), page("mapa")]
+    rows = generate_images(backend, book, GeneratedImageStore(str(tmp_path)))
+    assert states(rows) == ["vygenerováno", "vygenerováno"]
+    assert backend.attempts == {build_image_prompt("kotva"): 3, build_image_prompt("mapa"): 3}
+    assert all(p["image_source"] == "ai" and p["uploaded_image"].getvalue() for p in book)
+
+def test_failing_page_does_not_stop_others(tmp_path):
+    backend = FailingPrompt("mapa")
+    book = [page("kotva"), page("mapa"), page("truhla")]
+    done = []
+    rows = generate_images(backend, book, GeneratedImageStore(str(tmp_path)), on_done=done.append)
+    assert states(rows) == ["vygenerováno", "chyba", "vygenerováno"]
+    assert backend.attempts[build_image_prompt("mapa")] == 3
+    assert "uploaded_image" not in book[1]
+    assert sorted(row["strana"] for row in done) == [1, 2, 3]
+
+def test_identical_prompts_generated_once(tmp_path):
+    backend = FakeImageBackend(latency=0.05, size=(64, 48))
+    book = [page("kotva"), page("kotva"), page("kotva")]
+    rows = generate_images(backend, book, GeneratedImageStore(str(tmp_path)))
+    assert states(rows) == ["vygenerováno"] * 3
+    assert backend.call_count == 1
+    assert len({p["uploaded_image"].path for p in book}) == 1
+
+def test_user_upload_never_overwritten(tmp_path):
+    backend = FakeImageBackend(size=(64, 48))
+    upload = io.BytesIO(b"vlastni")
+    book = [page("kotva", uploaded_image=upload), page("mapa", uploaded_image=upload, image_source="upload")]
+    for force in (False, True):
+        rows = generate_images(backend, book, GeneratedImageStore(str(tmp_path)), force=force)
+        assert states(rows) == ["vlastní obrázek", "vlastní obrázek"]
+    assert all(p["uploaded_image"] is upload for p in book)
+    assert backend.call_count == 0
+
+def test_second_run_served_from_cache(tmp_path):
+    book = [page("kotva"), page("mapa"), page("")]
+    first = FakeImageBackend(size=(64, 48))
+    assert states(generate_images(first, book, GeneratedImageStore(str(tmp_path)))) == ["vygenerováno", "vygenerováno", "bez promptu"]
+
+    # Nový proces: jiný backend i store nad stejnou složkou, AI obrázky se obnoví z disku
+    again = [page("kotva", image_source="ai"), page("mapa"), page("")]
+    second = FakeImageBackend(size=(64, 48))
+    rows = generate_images(second, again, GeneratedImageStore(str(tmp_path)))
+    assert states(rows) == ["z cache", "z cache", "bez promptu"]
+    assert second.call_count == 0
+    assert again[0]["uploaded_image"].getvalue() == book[0]["uploaded_image"].getvalue()
+
+    # force=True obejde cache
+    assert states(generate_images(second, again, GeneratedImageStore(str(tmp_path)), force=True))[:2] == ["vygenerováno"] * 2
+    assert second.call_count == 2
+
+def test_store_evicts_least_recently_used(tmp_path):
+    import os
+    import time
+    backend = FakeImageBackend(size=(64, 48))
+    store = GeneratedImageStore(str(tmp_path))
+    generate_images(backend, [page("kotva"), page("mapa")], store)
+    kotva, mapa = (store.key(backend.model, build_image_prompt(p)) for p in ("kotva", "mapa"))
+    pair_bytes = sum(os.path.getsize(p) for p in store._paths(kotva))
+    old = time.time() - 60
+    for path in store._paths(kotva) + store._paths(mapa): os.utime(path, (old, old))
+    assert store.get(kotva) is not None     # zásah obnoví mtime – nejstarší je teď mapa
+
+    # Strop na zhruba dvě dvojice obrázek + náhled: třetí obrázek vytlačí mapu
+    store.max_bytes = pair_bytes * 2 + pair_bytes // 2
+    generate_images(backend, [page("truhla")], store)
+    assert store.get(mapa) is None
+    assert store.get(kotva) is not None
+    # Vyhozený obrázek se při další potřebě vygeneruje znovu
+    assert states(generate_images(backend, [page("mapa")], store)) == ["vygenerováno"]
+
+def test_store_expires_old_images(tmp_path):
+    import os
+    import time
+    backend = FakeImageBackend(size=(64, 48))
+    store = GeneratedImageStore(str(tmp_path), max_age=60)
+    generate_images(backend, [page("kotva")], store)
+    kotva = store.key(backend.model, build_image_prompt("kotva"))
+    old = time.time() - 120
+    for path in store._paths(kotva): os.utime(path, (old, old))
+    generate_images(backend, [page("mapa")], store)
+    assert not any(os.path.exists(p) for p in store._paths(kotva))
@@ -0,0 +1,90 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image, ImageCms, ImageDraw
+
+from images import ImageCache, ImageSpill, prepare_image
+
+def jpeg(size=(1200, 900), exif=None, quality=40, icc=None):
+    # Barevný šum – přes 256 barev, takže jde cestou JPEG jako fotka
+    img = Image.merge("RGB", [Image.effect_noise(size, 20) for _ in range(3)])
+    buf = io.BytesIO()
+    extra = {k: v for k, v in (("exif", exif), ("icc_profile", icc)) if v is not None}
+    img.save(buf, format="JPEG", quality=quality, **extra)
+    return buf.getvalue()
+
+def flat_png(size=(1800, 1200), exif=None, icc=None):
+    # Plochá grafika s pár barvami pod šířkou slotu (zmenšení by přidalo barvy) – jde cestou quantize + PNG
+    img = Image.new("RGB", size, (250, 240, 200))
+    draw = ImageDraw.Draw(img)
+    for n in range(8): draw.rectangle((n * 200, n * 130, n * 200 + 300, n * 130 + 200), fill=(40 * n, 90, 200 - 20 * n))
+    buf = io.BytesIO()
+    extra = {k: v for k, v in (("exif", exif), ("icc_profile", icc)) if v is not None}
+    img.save(buf, format="PNG", **extra)
+    return buf.getvalue()
+
+def srgb_icc():
+    return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+
+def phone_exif():
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"     # Make
+    exif[0x0112] = 6                # Orientation: otočit o 90°
+    return exif.tobytes()
+
+@pytest.mark.parametrize("make, fmt", [(jpeg, "JPEG"), (flat_png, "PNG")])
+def test_exif_stripped_and_orientation_applied(make, fmt):
+    data = make(exif=phone_exif(), icc=srgb_icc())
+    item, _ = prepare_image(data, cache=ImageCache())
+    assert item.fmt == fmt
+    assert b"PhoneMaker" not in item.data
+    out = Image.open(io.BytesIO(item.data))
+    assert not out.getexif()
+    assert "icc_profile" not in out.info
+    # Orientace 6 = na výšku
+    assert out.height > out.width
+
+def test_small_image_without_metadata_kept():
+    data = jpeg(size=(300, 200))
+    item, _ = prepare_image(data, cache=ImageCache())
+    if item.fmt == "ORIG": assert item.data == data
+    assert len(item.data) <= len(data)
+
+def test_large_image_downsampled_and_cached():
+    data = jpeg(size=(4000, 3000), quality=90)
+    cache = ImageCache()
+    item, cached = prepare_image(data, cache=cache)
+    assert not cached
+    assert Image.open(io.BytesIO(item.data)).width == 1890
+    again, cached = prepare_image(data, cache=cache)
+    assert cached and again is item
+
+def age(spilled, seconds):
+    t = time.time() - seconds
+    os.utime(spilled.path, (t, t))
+
+def test_spill_evicts_least_recently_used_over_cap(tmp_path):
+    spill = ImageSpill(str(tmp_path), max_bytes=250)
+    a, b = spill.put(b"a" * 100), spill.put(b"b" * 100)
+    age(a, 20)
+    age(b, 10)
+    a.getvalue()    # čtení obnoví mtime – teď je nejstarší b
+    c = spill.put(b"c" * 100)
+    assert a and c and not b
+    assert sum(f.stat().st_size for f in tmp_path.iterdir()) <= 250
+
+def test_spill_evicts_expired_files(tmp_path):
+    spill = ImageSpill(str(tmp_path), max_age=60)
+    old = spill.put(b"old")
+    age(old, 120)
+    new = spill.put(b"new")
+    assert new and not old
+    # Smazaný obrázek se chová jako chybějící, znovu nahraný se vrátí
+    assert spill.put(b"old")
+
+def test_spill_keeps_file_just_put_even_over_cap(tmp_path):
+    spill = ImageSpill(str(tmp_path), max_bytes=10)
+    big = spill.put(b"x" * 100)
+    assert big and big.getvalue() == b"x" * 100
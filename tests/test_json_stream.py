@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from json_stream import JsonArrayStream
+
+ITEMS = [
+    {"nadpis": "Závorky } ] { [ v textu", "kod": "1"},
+    {"zadani": 'Řekl "stůj" a \\ zmizel', "kod": "2"},
+    {"tabulka": [[1, 2], {"a": [3]}], "kod": "3"},
+]
+
+def feed_all(text, size):
+    parser = JsonArrayStream()
+    items = []
+    for i in range(0, len(text), size): items += parser.feed(text[i:i + size])
+    return parser, items
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_items_across_chunk_boundaries(size):
+    # Kusy po jednom znaku rozdělí i každý řetězec a každou escape sekvenci
+    text = "```json\n" + json.dumps(ITEMS, ensure_ascii=False) + "\n```"
+    parser, items = feed_all(text, size)
+    assert items == ITEMS
+    assert parser.started and parser.closed
+
+def test_escaped_quote_split_from_its_backslash():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"a": "x\\') == []
+    assert parser.feed('"y"}]') == [{"a": 'x"y'}]
+    assert parser.closed
+
+def test_preamble_before_array():
+    text = "Tady je kniha (verze 2):\n" + json.dumps(ITEMS[:1])
+    parser, items = feed_all(text, 5)
+    assert items == ITEMS[:1] and parser.closed
+
+def test_items_returned_as_soon_as_closed():
+    parser = JsonArrayStream()
+    assert parser.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert parser.feed(': 2}') == [{"b": 2}]
+    assert not parser.closed
+
+def test_truncated_array_not_closed():
+    text = json.dumps(ITEMS, ensure_ascii=False)
+    parser, items = feed_all(text[:len(text) // 2], 4)
+    assert parser.started and not parser.closed
+    assert len(items) < len(ITEMS)
+
+def test_text_after_array_ignored():
+    parser, items = feed_all('[{"a": 1}] a pak [{"b": 2}]', 3)
+    assert items == [{"a": 1}]
@@ -0,0 +1,77 @@
+import os
+import time
+
+from engine import call_gemini_cached, generate_book
+from fake_gemini import FakeClient
+from llm_cache import ResponseCache, cache_key
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get("m", "prompt", True) is None
+    cache.put("m", "prompt", True, [{"a": 1}])
+    assert cache.get("m", "prompt", True) == [{"a": 1}]
+    # Jiný model i jiný tvar odpovědi jsou jiný klíč
+    assert cache.get("m2", "prompt", True) is None
+    assert cache.get("m", "prompt", False) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+
+def test_lru_eviction_at_max_bytes(tmp_path):
+    value = {"text": "x" * 100}
+    cache = ResponseCache(str(tmp_path), max_bytes=350)
+    for n in range(3): cache.put("m", f"p{n}", False, value)
+    # p0 je nejdéle nepoužitý, ale čtením ho oživíme – vypadne p1
+    assert cache.get("m", "p0", False) == value
+    cache.put("m", "p3", False, value)
+    assert cache.stats()["bytes"] <= 350
+    assert cache.get("m", "p1", False) is None
+    assert cache.get("m", "p0", False) == value
+    assert cache.get("m", "p3", False) == value
+    assert not os.path.exists(cache._path(cache_key("m", "p1", False)))
+
+def test_index_rebuilt_from_disk_mtimes(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    for n in range(3): cache.put("m", f"p{n}", False, {"n": n})
+    # p0 nejnovější, p1 nejstarší
+    now = time.time()
+    for n, age in ((0, 0), (1, 300), (2, 100)):
+        path = cache._path(cache_key("m", f"p{n}", False))
+        os.utime(path, (now - age, now - age))
+
+    reopened = ResponseCache(str(tmp_path))
+    assert reopened.stats()["entries"] == 3
+    assert reopened.stats()["bytes"] == cache.stats()["bytes"]
+    assert list(reopened.index) == [cache_key("m", f"p{n}", False) for n in (1, 2, 0)]
+    assert reopened.get("m", "p2", False) == {"n": 2}
+
+def test_fake_client_served_from_cache(tmp_path):
+    client = FakeClient()
+    cache = ResponseCache(str(tmp_path))
+    first = call_gemini_cached(client, "Počet stran: 2", "m", expect_array=True, cache=cache)
+    second = call_gemini_cached(client, "Počet stran: 2", "m", expect_array=True, cache=cache)
+    assert first == second
+    assert client.call_count == 1
+
+    # Nová instance nad stejnou složkou – odpověď přežije restart
+    again = call_gemini_cached(client, "Počet stran: 2", "m", expect_array=True, cache=ResponseCache(str(tmp_path)))
+    assert again == first
+    assert client.call_count == 1
+
+def test_cache_none_and_disabled_bypass(tmp_path):
+    client = FakeClient()
+    for _ in range(2): call_gemini_cached(client, "Počet stran: 1", "m", cache=None)
+    assert client.call_count == 2
+
+    disabled = ResponseCache(str(tmp_path), enabled=False)
+    for _ in range(2): call_gemini_cached(client, "Počet stran: 1", "m", cache=disabled)
+    assert client.call_count == 4
+    assert disabled.stats()["entries"] == 0
+
+def test_whole_book_cached(tmp_path):
+    client = FakeClient()
+    cache = ResponseCache(str(tmp_path))
+    keys = ["caesar", "matching"]
+    first = generate_book(client, "Piráti", keys, cache=cache, local=False, max_repairs=0)
+    second = generate_book(client, "Piráti", keys, cache=cache, local=False, max_repairs=0)
+    assert first == second
+    assert client.call_count == 1
@@ -0,0 +1,29 @@
+import json
+
+from metrics import Metrics, collecting, configure_log, logger, span
+
+def test_configure_log_writes_json_lines_once(tmp_path):
+    path = tmp_path / "mereni.jsonl"
+    handler = configure_log(str(path))
+    try:
+        assert configure_log(str(path)) is handler
+        with span("pdf.page", strana=1): pass
+        handler.flush()
+        lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        assert [(l["span"], l["strana"]) for l in lines] == [("pdf.page", 1)]
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+def test_spans_since_mark_belong_to_one_run():
+    metrics = Metrics()
+    with collecting(metrics):
+        for strana in (1, 2, 3):
+            with span("pdf.page", strana=strana): pass
+        mark = metrics.seq
+        # Druhý běh vysází jen změněnou stranu
+        with span("pdf.page", strana=2): pass
+    assert [s["strana"] for s in metrics.spans_named("pdf.page")] == [1, 2, 3, 2]
+    assert [s["strana"] for s in metrics.spans_named("pdf.page", since=mark)] == [2]
+    metrics.reset()
+    assert metrics.seq == mark + 1
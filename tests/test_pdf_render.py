@@ -0,0 +1,88 @@
+import io
+import itertools
+
+from pypdf import PdfReader
+
+from catalog import PUZZLE_CATALOG
+from fake_gemini import fake_page
+from generators import LOCAL_GENERATORS, generate_local_page
+from images import SpilledImage
+from pdf_render import (LARGE_BOOK_IMAGE_BYTES, LARGE_BOOK_PAGES, PageCache, is_large_book, render_book,
+                        render_book_chunked, render_book_incremental)
+
+def book(pages):
+    keys = itertools.islice(itertools.cycle(PUZZLE_CATALOG), pages)
+    return [generate_local_page(k, "Piráti", i) if k in LOCAL_GENERATORS else dict(fake_page("x", i), type_key=k)
+            for i, k in enumerate(keys)]
+
+def page_count(data):
+    return len(PdfReader(io.BytesIO(data)).pages)
+
+def test_incremental_matches_full_render():
+    pages = book(12)
+    out = render_book_incremental(pages, cache=PageCache())
+    reader = PdfReader(io.BytesIO(out))
+    assert len(reader.pages) == page_count(render_book(pages))
+    assert pages[5]['nadpis'] in reader.pages[5].extract_text()
+
+def test_only_dirty_pages_rendered():
+    pages = book(10)
+    cache = PageCache()
+    stats = {}
+    render_book_incremental(pages, stats=stats, cache=cache)
+    assert stats == {"rendered": 10, "reused": 0}
+
+    pages[3] = dict(pages[3], nadpis="Nový nadpis")
+    pages[7] = dict(pages[7], zadani="Nové zadání")
+    out = render_book_incremental(pages, stats=stats, cache=cache)
+    assert stats == {"rendered": 2, "reused": 8}
+    assert "Nový nadpis" in PdfReader(io.BytesIO(out)).pages[3].extract_text()
+
+def test_size_does_not_grow_with_edits():
+    pages = book(10)
+    cache = PageCache()
+    first = len(render_book_incremental(pages, cache=cache))
+    for n in range(15):
+        pages[n % 10] = dict(pages[n % 10], nadpis=f"Úprava {n}")
+        out = render_book_incremental(pages, cache=cache)
+    # Font je ve výsledku jednou, ať se sázelo v kolika dávkách chce
+    assert len(out) < first * 1.05
+    assert page_count(out) == 10
+
+def test_duplicate_pages_are_separate_objects():
+    pages = book(3)
+    pages.append(dict(pages[0]))
+    out = render_book_incremental(pages, cache=PageCache())
+    reader = PdfReader(io.BytesIO(out))
+    assert len(reader.pages) == 4
+    assert reader.pages[0].indirect_reference.idnum != reader.pages[3].indirect_reference.idnum
+
+def test_chunked_render_deduplicates_fonts():
+    pages = book(12)
+    out = io.BytesIO()
+    render_book_chunked(pages, out, chunk_pages=3)
+    data = out.getvalue()
+    assert page_count(data) == 12
+    assert data.count(b"/FontFile2") == 2
+
+def test_large_book_by_pages_or_image_bytes():
+    assert not is_large_book(book(LARGE_BOOK_PAGES))
+    assert is_large_book(book(LARGE_BOOK_PAGES + 1))
+    pages = book(3)
+    pages[0]['uploaded_image'] = SpilledImage("/nonexistent", "00", LARGE_BOOK_IMAGE_BYTES + 1)
+    assert is_large_book(pages)
+
+def test_incremental_without_stable_fonts(monkeypatch):
+    # Záloha pro fpdf2 bez SubsetMap.pick: dávky mají každá svůj font, PDF musí zůstat platné
+    import pdf_render
+    original = pdf_render.new_pdf
+    monkeypatch.setattr(pdf_render, "new_pdf", lambda stable_fonts=False: original(stable_fonts=False))
+    pages = book(6)
+    cache = PageCache()
+    render_book_incremental(pages, cache=cache)
+    pages[2] = dict(pages[2], nadpis="Jiný nadpis")
+    out = render_book_incremental(pages, cache=cache)
+    reader = PdfReader(io.BytesIO(out))
+    assert len(reader.pages) == 6
+    assert "Jiný nadpis" in reader.pages[2].extract_text()
+    assert pages[3]["nadpis"] in reader.pages[3].extract_text()
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from engine import DEFAULT_MODEL, call_gemini_with_retry, generate_text
+from fake_gemini import FakeClient
+from scheduler import DEFAULT_BURST, Scheduler, TokenBucket, queued
+
+def hold(scheduler, seconds=0.2):
+    # Zastaví odesílání, ať se fronta stihne naplnit celá najednou
+    scheduler.bucket.block(seconds, time.monotonic())
+
+def test_invalid_rate_and_burst_rejected():
+    with pytest.raises(ValueError): Scheduler(rate_per_sec=0)
+    with pytest.raises(ValueError): Scheduler(rate_per_sec=-1)
+    with pytest.raises(ValueError): TokenBucket(1.0, burst=0.5)
+
+def test_default_burst_lets_sessions_run_concurrently():
+    scheduler = Scheduler(rate_per_sec=1.0)
+    assert scheduler.bucket.capacity == DEFAULT_BURST
+    client = FakeClient(latency=0.3)
+    start = time.perf_counter()
+    futures = [scheduler.submit(f"s{n}", lambda n=n: generate_text(client, f"prompt {n}", DEFAULT_MODEL)) for n in range(4)]
+    for f in futures: f.result()
+    # S burst 1 by to při 1 dotazu/s trvalo přes 3 s
+    assert time.perf_counter() - start < 1.0
+
+def test_round_robin_between_sessions_and_position():
+    scheduler = Scheduler(rate_per_sec=100, burst=10, workers=1)
+    order = []
+    hold(scheduler)
+    futures = [scheduler.submit(session, lambda label=f"{session}{n}": order.append(label))
+               for session, count in (("A", 3), ("B", 2), ("C", 1)) for n in range(1, count + 1)]
+
+    a, c = scheduler.position("A"), scheduler.position("C")
+    assert (a["position"], a["waiting"], a["sessions"]) == (1, 3, 3)
+    assert (c["position"], c["waiting"]) == (3, 1)
+    assert a["cooldown"] > 0
+    assert scheduler.position("D") is None
+
+    for f in futures: f.result(timeout=5)
+    assert order == ["A1", "B1", "C1", "A2", "B2", "A3"]
+    assert scheduler.position("A") is None
+
+def test_identical_requests_in_flight_sent_once():
+    scheduler = Scheduler(rate_per_sec=100, burst=10)
+    client = FakeClient(latency=0.3)
+    results = []
+
+    def book(session):
+        with queued(scheduler, session):
+            results.append(call_gemini_with_retry(client, "Téma: lesy. Počet stran: 2", DEFAULT_MODEL))
+
+    threads = [threading.Thread(target=book, args=(f"s{n}",)) for n in range(3)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert client.call_count == 1
+    assert scheduler.stats["deduplicated"] == 2
+    assert len(results) == 3 and results[0] == results[1] == results[2]
+
+def test_rate_limited_request_retried_first_after_cooldown():
+    # Kvóta 2 dotazy/s s rezervou 2: třetí dotaz hned za sebou dostane 429
+    client = FakeClient(quota=2)
+    scheduler = Scheduler(rate_per_sec=100, burst=10, workers=1, cooldown=0.5)
+    done = []
+
+    def call(label):
+        generate_text(client, label, DEFAULT_MODEL)
+        done.append((label, time.monotonic()))
+
+    hold(scheduler)
+    futures = [scheduler.submit(session, lambda label=label: call(label))
+               for session, label in (("A", "A1"), ("B", "B1"), ("A", "A2"), ("B", "B2"))]
+    for f in futures: f.result(timeout=10)
+
+    assert client.rejected >= 1
+    assert scheduler.stats["rate_limited"] == client.rejected
+    # A2 dostal 429 a šel na začátek fronty – B2 ho nepředběhl
+    assert [label for label, _ in done] == ["A1", "B1", "A2", "B2"]
+    assert done[2][1] - done[1][1] >= 0.5
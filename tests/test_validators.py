@@ -0,0 +1,24 @@
+from validators import build_repair_note, validate_page
+
+def page(type_key, kod, zadani="Zadání.", **extra):
+    return {"nadpis": "N", "zadani": zadani, "kod": kod, "prompt": "P", "type_key": type_key, **extra}
+
+def test_valid_pages():
+    assert validate_page(page("matching", "2312")) == []
+    assert validate_page(page("hidden_objects", "524", "Spočítej:\n1. A?\n2. B?\n3) C?")) == []
+    # Šifra bez pravidel v katalogu – jen povinná pole
+    assert validate_page(page("logic_elimination", "cokoli")) == []
+
+def test_missing_fields_reported_first():
+    errors = validate_page({"Nadpis": "Velké písmeno stačí", "type_key": "matching"})
+    assert errors == ["Chybí pole 'zadani'.", "Chybí pole 'kod'.", "Chybí pole 'prompt'."]
+
+def test_kod_format_and_question_count():
+    assert len(validate_page(page("matching", "4444"))) == 1
+    errors = validate_page(page("hidden_objects", "52", "1. A?\n2. B?\n3. C?"))
+    assert errors == ["Kód má 2 číslic, ale zadání má 3 očíslovaných otázek."]
+    assert len(validate_page(page("hidden_objects", "5x", "1. A?\n2. B?"))) == 1
+
+def test_repair_note_lists_errors():
+    note = build_repair_note(["Chyba A.", "Chyba B."])
+    assert "- Chyba A." in note and "- Chyba B." in note
@@ -0,0 +1,44 @@
+# ==========================================
+# KONTROLA VÝSTUPU AI
+# Pravidla bere z PUZZLE_CATALOG ("kod_format", "kod_per_question"),
+# k tomu obecné kontroly, které platí pro každou stranu.
+# Vrací seznam chyb česky – prázdný seznam = strana je v pořádku.
+# ==========================================
+import re
+
+from catalog import PUZZLE_CATALOG
+
+REQUIRED_FIELDS = ("nadpis", "zadani", "kod", "prompt")
+KOD_FORMATS = {key: re.compile(puz["kod_format"]) for key, puz in PUZZLE_CATALOG.items() if "kod_format" in puz}
+QUESTION_RE = re.compile(r"^\s*\d+[.)]", re.MULTILINE)
+
+def field(page, name):
+    # Gemini občas vrátí klíč s velkým písmenem
+    value = page.get(name) or page.get(name.capitalize(), "")
+    return str(value).strip()
+
+def count_questions(zadani):
+    return len(QUESTION_RE.findall(zadani))
+
+def validate_page(page):
+    errors = [f"Chybí pole '{name}'." for name in REQUIRED_FIELDS if not field(page, name)]
+    puz = PUZZLE_CATALOG.get(page.get("type_key"))
+    if puz is None or errors: return errors
+
+    kod = field(page, "kod")
+    kod_format = KOD_FORMATS.get(page["type_key"])
+    if kod_format and not kod_format.fullmatch(kod):
+        errors.append(f"Kód '{kod}' neodpovídá formátu {puz['kod_format']}.")
+    if puz.get("kod_per_question"):
+        otazky = count_questions(field(page, "zadani"))
+        if otazky != len(kod):
+            errors.append(f"Kód má {len(kod)} číslic, ale zadání má {otazky} očíslovaných otázek.")
+    return errors
+
+def build_repair_note(errors):
+    seznam = "\n".join(f"- {e}" for e in errors)
+    return f"""
+            ❗ Předchozí pokus o tuto stranu byl chybný:
+            {seznam}
+            Vytvoř stranu znovu a tyto chyby oprav.
+            """